@@ -8,10 +8,59 @@ from core.markdown_extract import show_readme
 from ui.sidebar import render_sidebar
 from ui.tabs import display_playlist_info, display_tracks_list, display_track_analyzer
 from ui.chatbot import music_chatbot_ui
+from core.render_timing import timed
+from core.ingest import render_ingestion_status
 
 # st.set_page_config(page_title="Music Assistant", layout="wide")
 
-render_sidebar()
+with timed("sidebar"):
+    render_sidebar()
+
+# Each tab and the right-hand column are fragments: interacting with one (chat input,
+# track filter, cluster selectbox, jukebox) reruns only that fragment, not all of main().
+# They read their inputs from session state so a fragment rerun always sees current data.
+@st.fragment
+def playlist_info_fragment():
+    with timed("playlist_info"):
+        display_playlist_info(
+            st.session_state['playlist_data'], 
+            st.session_state['tracks_with_lyrics'], 
+            st.session_state['agents']
+        )
+
+@st.fragment
+def tracks_list_fragment():
+    with timed("tracks_list"):
+        display_tracks_list(st.session_state['tracks_with_lyrics'])
+
+@st.fragment
+def track_analyzer_fragment():
+    with timed("track_analyzer"):
+        display_track_analyzer(
+            st.session_state['playlist_data'], 
+            st.session_state['tracks_with_lyrics'], 
+            st.session_state['agents']
+        )
+
+@st.fragment
+def music_web_fragment():
+    with timed("music_web"):
+        render_music_clusters_graph(
+            st.session_state['tracks_with_lyrics']
+        )
+
+@st.fragment
+def jukebox_fragment():
+    with timed("jukebox"):
+        playback()
+
+@st.fragment
+def chatbot_fragment():
+    with timed("chatbot"):
+        if 'tracks_with_lyrics' in st.session_state and 'agents' in st.session_state:
+            music_chatbot_ui(st.session_state['agents'], st.session_state['tracks_with_lyrics'])
+        else:
+            music_chatbot_ui(None, None)
 
 def main():
     if 'analysis_ready' not in st.session_state:
@@ -40,6 +89,7 @@ def main():
                     st.session_state['tracks_with_lyrics'] = None
                     st.session_state['agents'] = None
                     st.session_state['search_songs'] = None
+                    st.session_state['playlist_job'] = None
                     st.rerun()
 
             with search_col:
@@ -47,28 +97,22 @@ def main():
                     st.session_state['search_songs'] = st.text_input(" ", placeholder="Search Song...", key="song_search_input", label_visibility="collapsed")
 
 
+        if st.session_state.get('playlist_job'):
+            title_placeholder.empty()
+            render_ingestion_status()
+
         if st.session_state.get('analysis_ready'):
             title_placeholder.empty()
             st.header("Playlist Analyzer")
             tab1, tab2, tab3, tab4 = st.tabs(["Playlist Info", "Tracks List", "Track Analyzer", "Music Web"])
             with tab1:
-                display_playlist_info(
-                    st.session_state['playlist_data'], 
-                    st.session_state['tracks_with_lyrics'], 
-                    st.session_state['agents']
-                )
+                playlist_info_fragment()
             with tab2:
-                display_tracks_list(st.session_state['tracks_with_lyrics'])
+                tracks_list_fragment()
             with tab3:
-                display_track_analyzer(
-                    st.session_state['playlist_data'], 
-                    st.session_state['tracks_with_lyrics'], 
-                    st.session_state['agents']
-                )
+                track_analyzer_fragment()
             with tab4:
-                render_music_clusters_graph(
-                    st.session_state['tracks_with_lyrics']
-                )
+                music_web_fragment()
         elif st.session_state['search_songs']:
             title_placeholder.empty()
             if st.session_state.get('spotify_client_id') and st.session_state.get('spotify_client_secret') and st.session_state.get('gemini_api_key') and not st.session_state.get('sp_info'):
@@ -87,17 +131,15 @@ def main():
     with right_sidebar:
         with st.container(key="rightbar_container"):
             if st.session_state.get('spotify_client_id') and st.session_state.get('spotify_client_secret') and st.session_state.get('gemini_api_key') and not st.session_state.get('sp_info'):  
-                playback()
-                if 'tracks_with_lyrics' in st.session_state and 'agents' in st.session_state:
-                    music_chatbot_ui(st.session_state['agents'], st.session_state['tracks_with_lyrics'])
-                else:
-                    music_chatbot_ui(None, None)
+                jukebox_fragment()
+                chatbot_fragment()
             else:
                 st.warning("Chatbot and Jukebox are not available. Please authenticate with Spotify to use this feature.")
         
 
 if __name__ == "__main__":
-    main()
+    with timed("main"):
+        main()
 
 st.markdown("""
         <style>
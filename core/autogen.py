@@ -1,11 +1,43 @@
 ### File: core/autogen.py
+import json
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from autogen import AssistantAgent, UserProxyAgent
 import streamlit as st
+from core.llm_cache import get_cached_response, store_response
+
+GEMINI_MODEL = "gemini-2.0-flash-lite"
+
+# Songs packed into one batch analysis request, and how many batch requests may run at once.
+ANALYSIS_BATCH_SIZE = 8
+ANALYSIS_CONCURRENCY = 3
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY, thread_name_prefix="song-analysis")
+
+_timings_lock = threading.Lock()
+_llm_timings = defaultdict(lambda: deque(maxlen=200))
+
+# One pooled HTTP client per API key, shared by every session; a new key just builds
+# (and caches) its own client on first use.
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_gemini_client(gemini_api_key):
+    return OpenAI(api_key=gemini_api_key, base_url="https://generativelanguage.googleapis.com/v1beta/")
 
 def setup_autogen_agents(gemini_api_key):
-    gemini_llm = OpenAI(api_key=gemini_api_key, base_url="https://generativelanguage.googleapis.com/v1beta/")
+    return {
+        "gemini_llm": get_gemini_client(gemini_api_key),
+        "gemini_api_key": gemini_api_key
+    }
 
+def build_autogen_agents(gemini_api_key):
+    """
+    Fresh AutoGen agents for one agent chat. They keep their message history
+    between chats, so they are never shared between sessions or threads.
+    """
     playlist_agent = AssistantAgent(
         name="playlist_agent",
         llm_config={"config_list": [{"model": "gemini-2.0-flash-lite", "api_key": gemini_api_key, "base_url": "https://generativelanguage.googleapis.com/v1beta/"}]},
@@ -30,16 +62,12 @@ def setup_autogen_agents(gemini_api_key):
     return {
         "playlist_agent": playlist_agent,
         "lyrics_agent": lyrics_agent,
-        "user_proxy": user_proxy,
-        "gemini_llm": gemini_llm
+        "user_proxy": user_proxy
     }
 
-def analyze_playlist_with_agents(agents, playlist_data, tracks_with_lyrics, analysis_type):
-    user_proxy = agents["user_proxy"]
-    gemini_llm = agents["gemini_llm"]
-
+def build_analysis_prompt(agents, playlist_data, tracks_with_lyrics, analysis_type):
     if analysis_type == "lyrics":
-        target_agent = agents["lyrics_agent"]
+        target_agent = "lyrics_agent"
         lyrics_data = "\n\n".join([
             f"Song: {t['title']} by {t['artist']}\nLyrics sample: {t['lyrics'][:500]}..." for t in tracks_with_lyrics[:5]
         ])
@@ -49,7 +77,7 @@ def analyze_playlist_with_agents(agents, playlist_data, tracks_with_lyrics, anal
             Provide insights on themes, sentiment, and language use.
         """
     else:
-        target_agent = agents["playlist_agent"]
+        target_agent = "playlist_agent"
         top_artists = sorted({t['artist']:0 for t in tracks_with_lyrics}.keys())[:5]
         prompt = f"""
             Analyze the Spotify playlist \"{playlist_data.get('name')}\" by {playlist_data.get('owner', {}).get('display_name')}.
@@ -57,16 +85,150 @@ def analyze_playlist_with_agents(agents, playlist_data, tracks_with_lyrics, anal
             Description: {playlist_data.get('description')}
             Summarize its theme and purpose.
         """
+    return target_agent, prompt
 
+def record_llm_timing(kind, time_to_first_token, total_time):
+    with _timings_lock:
+        _llm_timings[kind].append((time_to_first_token, total_time))
+
+def llm_timing_stats():
+    """Median time-to-first-token and total completion time (seconds) per request kind."""
+    with _timings_lock:
+        return {
+            kind: {
+                "requests": len(samples),
+                "median_ttft": statistics.median(t for t, _ in samples),
+                "median_total": statistics.median(total for _, total in samples),
+            }
+            for kind, samples in _llm_timings.items() if samples
+        }
+
+def stream_completion(gemini_llm, messages, kind):
+    """Yield completion text as it arrives, recording time-to-first-token separately from total time."""
+    start = time.perf_counter()
+    first_token = None
+    stream = gemini_llm.chat.completions.create(model=GEMINI_MODEL, messages=messages, stream=True)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            yield delta
+    total = time.perf_counter() - start
+    record_llm_timing(kind, first_token if first_token is not None else total, total)
+
+def autogen_analysis(agents, target_agent, prompt):
+    """Fallback when the direct completion fails or comes back empty: run the AutoGen agent chat."""
+    autogen_agents = build_autogen_agents(agents["gemini_api_key"])
+    chat_result = autogen_agents["user_proxy"].initiate_chat(autogen_agents[target_agent], message=prompt)
+    for msg in chat_result.chat_history:
+        if msg["role"] == "assistant" and msg.get("content"):
+            return msg["content"]
+    return None
+
+def stream_playlist_analysis(agents, playlist_data, tracks_with_lyrics, analysis_type):
+    """Stream a playlist or lyrics analysis for st.write_stream, from the LLM cache when possible."""
+    target_agent, prompt = build_analysis_prompt(agents, playlist_data, tracks_with_lyrics, analysis_type)
+    cached = get_cached_response(GEMINI_MODEL, prompt, analysis_type)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
     try:
         messages = [{"role": "user", "content": prompt}]
-        response_obj = gemini_llm.chat.completions.create(model="gemini-2.0-flash-lite", messages=messages)
-        if response_obj and response_obj.choices:
-            return response_obj.choices[0].message.content
-        chat_result = user_proxy.initiate_chat(target_agent, message=prompt)
-        for msg in chat_result.chat_history:
-            if msg["role"] == "assistant":
-                return msg["content"]
+        for delta in stream_completion(agents["gemini_llm"], messages, analysis_type):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        if parts:
+            st.error(f"AutoGen analysis failed: {str(e)}")
+            return
+
+    if parts:
+        store_response(GEMINI_MODEL, prompt, analysis_type, "".join(parts))
+        return
+
+    try:
+        content = autogen_analysis(agents, target_agent, prompt)
     except Exception as e:
         st.error(f"AutoGen analysis failed: {str(e)}")
-    return "No analysis available."
\ No newline at end of file
+        content = None
+    if content:
+        store_response(GEMINI_MODEL, prompt, analysis_type, content)
+        yield content
+    else:
+        yield "No analysis available."
+
+def has_lyrics(track):
+    return bool(track.get("lyrics")) and track["lyrics"] != "Lyrics not found"
+
+def parse_batch_analyses(content):
+    """Pull the JSON list out of a batch reply, tolerating ```json fences around it."""
+    match = re.search(r"\[.*\]", content or "", re.S)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    return {item["index"]: item["analysis"] for item in items if isinstance(item, dict) and "index" in item and item.get("analysis")}
+
+def analyze_songs_batch(agents, playlist_data, tracks):
+    """
+    Analyse several songs with one request. Each result is stored on its track and
+    in the LLM cache under the same key a single-song analysis would use, so the
+    Track Analyzer finds it without another call.
+    """
+    songs = "\n\n".join(
+        f"Song {i}: {t['title']} by {t['artist']}\nLyrics sample: {t['lyrics'][:500]}..." for i, t in enumerate(tracks)
+    )
+    prompt = f"""
+        Analyze the lyrics of each song below from playlist \"{playlist_data.get('name')}\".
+        For every song give insights on themes, sentiment, and language use in a short paragraph.
+        Respond with JSON only: a list of objects {{"index": <song number>, "analysis": "<text>"}}.
+
+        {songs}
+    """
+    response_obj = agents["gemini_llm"].chat.completions.create(
+        model=GEMINI_MODEL, messages=[{"role": "user", "content": prompt}]
+    )
+    analyses = parse_batch_analyses(response_obj.choices[0].message.content if response_obj.choices else "")
+    if not analyses:
+        raise ValueError("batch reply had no parsable analyses")
+    for i, track in enumerate(tracks):
+        analysis = analyses.get(i)
+        if analysis:
+            _, single_prompt = build_analysis_prompt(agents, playlist_data, [track], "lyrics")
+            store_response(GEMINI_MODEL, single_prompt, "lyrics", analysis)
+            track["analysis"] = analysis
+    return len(analyses)
+
+def precompute_song_analyses(agents, playlist_data, tracks_with_lyrics):
+    """
+    Queue background batch analysis for every song with lyrics that has no
+    cached analysis yet. Batches run concurrently, capped by the executor size
+    to stay under the Gemini rate limit. Returns the list of futures.
+    """
+    pending = []
+    for track in tracks_with_lyrics:
+        if not has_lyrics(track) or track.get("analysis"):
+            continue
+        _, single_prompt = build_analysis_prompt(agents, playlist_data, [track], "lyrics")
+        cached = get_cached_response(GEMINI_MODEL, single_prompt, "lyrics")
+        if cached is not None:
+            track["analysis"] = cached
+        else:
+            pending.append(track)
+    return [
+        analysis_executor.submit(analyze_songs_batch, agents, playlist_data, pending[i:i + ANALYSIS_BATCH_SIZE])
+        for i in range(0, len(pending), ANALYSIS_BATCH_SIZE)
+    ]
+
+def song_analysis_status(futures):
+    """(batches still running, errors of failed batches) for the futures from precompute_song_analyses."""
+    running = sum(1 for f in futures if not f.done())
+    errors = [f.exception() for f in futures if f.done() and not f.cancelled() and f.exception()]
+    return running, errors
@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from core.autogen import GEMINI_MODEL
+from core.prompt_builder import estimate_tokens
+
+# Messages kept in session state; older ones survive only through the summary.
+CHAT_HISTORY_LIMIT = 40
+# Most recent messages never folded into the summary.
+KEEP_RECENT = 6
+# Summarize once this many older messages have piled up.
+SUMMARIZE_BATCH = 6
+HISTORY_TOKEN_BUDGET = 1500
+MAX_MESSAGE_CHARS = 800
+# Backoff after a failed summary: doubles per consecutive failure, up to the max.
+SUMMARY_RETRY_SECONDS = 10
+SUMMARY_RETRY_MAX = 300
+
+summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+
+def get_chat_memory():
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = {
+            "summary": "", "summarized": 0, "future": None, "future_upto": 0, "failures": 0, "retry_at": 0.0
+        }
+    return st.session_state.chat_memory
+
+
+def summarize_turns(gemini_llm, summary, messages):
+    transcript = "\n".join(f"{m['role']}: {m['content'][:MAX_MESSAGE_CHARS]}" for m in messages)
+    prompt = (
+        "Update the running summary of a conversation between a user and a music assistant. "
+        "Keep the user's tastes, requests, songs and artists mentioned, and any open questions. "
+        "Answer with the new summary only, in at most 150 words.\n\n"
+        f"Current summary: {summary or '(none)'}\n\nNew messages:\n{transcript}"
+    )
+    response_obj = gemini_llm.chat.completions.create(
+        model=GEMINI_MODEL,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return response_obj.choices[0].message.content.strip()
+
+
+def update_chat_memory(agents):
+    """
+    Called once per render: applies a finished background summary, trims
+    chat_history to CHAT_HISTORY_LIMIT, and starts summarizing older turns in the
+    background once enough of them have accumulated. Failed summaries are retried
+    with exponential backoff.
+    """
+    history = st.session_state.chat_history
+    memory = get_chat_memory()
+
+    future = memory["future"]
+    if future is not None and future.done():
+        try:
+            memory["summary"] = future.result()
+            memory["summarized"] = max(memory["future_upto"], 0)
+            memory["failures"] = 0
+        except Exception as e:
+            memory["failures"] += 1
+            memory["retry_at"] = time.time() + min(SUMMARY_RETRY_SECONDS * 2 ** (memory["failures"] - 1), SUMMARY_RETRY_MAX)
+            st.error(f"Error summarizing the earlier conversation: {e}")
+        memory["future"] = None
+
+    # The cap always holds; turns dropped before they were summarized are simply lost.
+    overflow = len(history) - CHAT_HISTORY_LIMIT
+    if overflow > 0:
+        del history[:overflow]
+        memory["summarized"] = max(memory["summarized"] - overflow, 0)
+        memory["future_upto"] -= overflow
+
+    if memory["future"] is not None or time.time() < memory["retry_at"]:
+        return
+
+    upto = len(history) - KEEP_RECENT
+    if agents and "gemini_llm" in agents and upto - memory["summarized"] >= SUMMARIZE_BATCH:
+        memory["future"] = summary_executor.submit(
+            summarize_turns, agents["gemini_llm"], memory["summary"], history[memory["summarized"]:upto]
+        )
+        memory["future_upto"] = upto
+
+
+def build_conversation_prompt(history, budget=HISTORY_TOKEN_BUDGET):
+    """Running summary plus as many of the newest unsummarized turns as fit in the budget."""
+    memory = get_chat_memory()
+    header = f"Summary of the earlier conversation: {memory['summary']}\n" if memory["summary"] else ""
+    used = estimate_tokens(header)
+    lines = []
+    for msg in reversed(history[memory["summarized"]:]):
+        content = msg["content"]
+        if len(content) > MAX_MESSAGE_CHARS:
+            content = content[:MAX_MESSAGE_CHARS] + "..."
+        line = f"{msg['role']}: {content}"
+        cost = estimate_tokens(line)
+        if lines and used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return header + "\n".join(reversed(lines))
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for an external provider.
+    Errors and calls slower than slow_call_seconds count as failures. Once the
+    failure rate over the window reaches failure_threshold the breaker opens and
+    rejects calls for reset_timeout seconds, then lets a single half-open probe
+    through to decide whether to close again.
+    """
+
+    def __init__(self, name, failure_threshold=0.5, window_size=20, min_calls=5,
+                 slow_call_seconds=4.0, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self._window = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record(self, success, duration=0.0):
+        failed = not success or duration > self.slow_call_seconds
+        with self._lock:
+            if self._state == OPEN:
+                # Late result from a call started before the breaker tripped.
+                return
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._trip()
+                else:
+                    self._state = CLOSED
+                    self._window.clear()
+                return
+            self._window.append(failed)
+            if len(self._window) >= self.min_calls and sum(self._window) / len(self._window) >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+
+    def snapshot(self):
+        with self._lock:
+            calls = len(self._window)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failure_rate": round(sum(self._window) / calls, 2) if calls else 0.0,
+            }
@@ -1,7 +1,6 @@
 import streamlit as st
-from core.spotify import get_spotify_token, extract_playlist_id, get_playlist_details, get_playlist_tracks
-from core.lyrics import process_tracks
-from core.autogen import setup_autogen_agents
+from core.spotify import get_spotify_token, extract_playlist_id, get_playlist_details, iter_playlist_tracks
+from core.ingest import ingest_playlist
 
 def playlist_client_flow():
     client_id = st.session_state.get('spotify_client_id')
@@ -33,27 +32,14 @@ def playlist_client_flow():
             if analyze_button:
                 st.session_state['active_tab'] = 0
 
-                # Full-screen spinner
-                with st.spinner("Analyzing playlist..."):
-                    agents = setup_autogen_agents(gemini_key)
-
+                with st.spinner("Fetching playlist data..."):
                     playlist_data = get_playlist_details(access_token, playlist_id)
                     if not playlist_data:
                         st.error("Failed to fetch playlist details")
                         return
 
-                    tracks = get_playlist_tracks(access_token, playlist_id)
-                    if not tracks:
-                        st.error("Failed to fetch playlist tracks")
-                        return
-
-                    progress_bar = st.progress(0)
-                    tracks_with_lyrics = process_tracks(tracks, progress_bar)
-
-                st.session_state['playlist_data'] = playlist_data
-                st.session_state['tracks_with_lyrics'] = tracks_with_lyrics
-                st.session_state['agents'] = agents
-                st.session_state['analysis_ready'] = True
+                # Pages stream straight into the lyrics pipeline as they arrive.
+                ingest_playlist(playlist_data, iter_playlist_tracks(access_token, playlist_id))
             
     st.markdown("""
         <style>
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeout applied to every outbound call unless overridden.
+DEFAULT_TIMEOUT = (3.05, 10)
+POOL_CONNECTIONS = 8
+POOL_MAXSIZE = 32
+
+
+def new_session():
+    """
+    Keep-alive session with the same pool settings as the shared one, for clients
+    that own and close their session (spotipy closes it when the client is
+    garbage-collected, which would tear down the shared pools).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+
+_session = new_session()
+_adapter = _session.get_adapter("https://")
+
+_stats_lock = threading.Lock()
+_host_stats = defaultdict(lambda: {"requests": 0, "errors": 0, "total_latency": 0.0, "connections_opened": 0})
+
+
+def get_session():
+    """Shared keep-alive session used by request() and the helpers below."""
+    return _session
+
+
+def _record(url, latency, error):
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    try:
+        opened = _adapter.poolmanager.connection_from_url(url).num_connections
+    except Exception:
+        opened = None
+    with _stats_lock:
+        stats = _host_stats[host]
+        stats["requests"] += 1
+        stats["errors"] += int(error)
+        stats["total_latency"] += latency
+        if opened is not None:
+            stats["connections_opened"] = opened
+
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    start = time.perf_counter()
+    error = True
+    try:
+        response = _session.request(method, url, timeout=timeout, **kwargs)
+        error = False
+        return response
+    finally:
+        _record(url, time.perf_counter() - start, error)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+def http_stats():
+    """
+    Per-host request counts, average latency and how many requests reused
+    an already-open connection instead of paying a new TCP/TLS handshake.
+    """
+    with _stats_lock:
+        report = {}
+        for host, stats in _host_stats.items():
+            count = stats["requests"]
+            report[host] = {
+                "requests": count,
+                "errors": stats["errors"],
+                "avg_latency_ms": round(1000 * stats["total_latency"] / count, 1) if count else 0.0,
+                "connections_opened": stats["connections_opened"],
+                "connections_reused": max(count - stats["connections_opened"], 0),
+            }
+        return report
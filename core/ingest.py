@@ -0,0 +1,118 @@
+import time
+import uuid
+import streamlit as st
+from core.lyrics import iter_process_tracks, track_item
+from core.lyrics_cache import MISS_TTL
+from core.autogen import setup_autogen_agents, precompute_song_analyses
+from core.playlist_store import load_playlist_snapshot, save_playlist_snapshot
+from core.jobs import submit_job, DONE, FAILED
+
+# How often a session polls its ingestion job while it runs.
+JOB_POLL_SECONDS = 1.0
+
+
+def needs_lyrics_retry(record):
+    """Misses from a provider outage, or older than the lyrics cache's MISS_TTL, are looked up again."""
+    if record['lyrics'] != "Lyrics not found":
+        return False
+    return record.get('provider_failed', True) or time.time() - record.get('checked_at', 0) > MISS_TTL
+
+
+def run_ingestion(job, playlist_id, snapshot_id, items, stored):
+    """
+    Job body: the ingestion pipeline (playlist pages -> lyrics lookup -> track
+    records), publishing records on the job as they arrive. Runs on the job pool,
+    so it must not touch st.* APIs.
+    """
+    known_tracks = {
+        t['id']: t for t in stored['tracks']
+        if t.get('id') and not needs_lyrics_retry(t)
+    } if stored else None
+    for record in iter_process_tracks(items, known_tracks=known_tracks):
+        job.records.append(record)
+    save_playlist_snapshot(playlist_id, snapshot_id, job.records)
+    return job.records
+
+
+def render_stream_progress(tracks_with_lyrics, total):
+    loaded = len(tracks_with_lyrics)
+    found = sum(1 for t in tracks_with_lyrics if t["lyrics"] != "Lyrics not found")
+    total = max(total, loaded)
+    st.progress(loaded / total if total else 1.0, text=f"Loaded {loaded} / {total} tracks ({found} with lyrics)")
+    st.dataframe(
+        [
+            {"#": i + 1, "Title": t["title"], "Artist": t["artist"], "Lyrics": t["lyrics"] != "Lyrics not found"}
+            for i, t in enumerate(tracks_with_lyrics)
+        ],
+        hide_index=True,
+        height=250
+    )
+
+
+def finish_ingestion(playlist_data, tracks_with_lyrics):
+    with st.spinner("Setting up AutoGen agents..."):
+        agents = setup_autogen_agents(st.session_state.get('gemini_api_key'))
+    # Per-song analyses are filled in the background so the Track Analyzer is instant.
+    st.session_state['song_analysis_jobs'] = precompute_song_analyses(agents, playlist_data, tracks_with_lyrics)
+
+    st.session_state['playlist_data'] = playlist_data
+    st.session_state['tracks_with_lyrics'] = tracks_with_lyrics
+    st.session_state['agents'] = agents
+    st.session_state['analysis_ready'] = True
+
+
+def ingest_playlist(playlist_data, items):
+    """
+    Analyse a playlist, reusing the last stored analysis when possible.
+    An unchanged snapshot_id finishes immediately without fetching anything, unless
+    some misses are due for a retry (see needs_lyrics_retry).
+    Otherwise the work is handed to a background job keyed by playlist id and
+    snapshot, so sessions opening the same playlist share one job. Only tracks added
+    since the stored snapshot get a lyrics lookup, and removed ones drop out.
+    The session then follows the job through render_ingestion_status.
+    """
+    playlist_id = playlist_data.get('id')
+    snapshot_id = playlist_data.get('snapshot_id')
+    stored = load_playlist_snapshot(playlist_id)
+
+    if stored and snapshot_id and stored['snapshot_id'] == snapshot_id:
+        if not any(needs_lyrics_retry(t) for t in stored['tracks']):
+            finish_ingestion(playlist_data, stored['tracks'])
+            return stored['tracks']
+        # Same tracks, but some lyrics lookups are due again: rerun just those from the
+        # stored records. The key changes with every save, so each retry is a new job.
+        key = ("playlist", playlist_id, snapshot_id, stored['updated_at'])
+        items = (track_item(t) for t in stored['tracks'])
+    elif playlist_id and snapshot_id:
+        key = ("playlist", playlist_id, snapshot_id)
+    else:
+        key = ("playlist", uuid.uuid4().hex)
+
+    job = submit_job(
+        key,
+        lambda job: run_ingestion(job, playlist_id, snapshot_id, items, stored),
+        total=playlist_data.get('tracks', {}).get('total', 0)
+    )
+    st.session_state['playlist_job'] = {"job": job, "playlist_data": playlist_data}
+    return job
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_ingestion_status():
+    """Polls this session's ingestion job, showing tracks as they arrive."""
+    pending = st.session_state.get('playlist_job')
+    if not pending:
+        return
+    job = pending["job"]
+
+    if job.status == FAILED:
+        del st.session_state['playlist_job']
+        st.error(f"Error fetching playlist tracks: {job.error}")
+        return
+    if job.status == DONE:
+        del st.session_state['playlist_job']
+        finish_ingestion(pending["playlist_data"], job.result)
+        st.rerun()
+
+    st.subheader(f"Loading \"{pending['playlist_data'].get('name', 'playlist')}\"...")
+    render_stream_progress(list(job.records), job.total)
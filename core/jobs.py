@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = 4
+# Finished jobs kept around so later sessions asking for the same key get the result directly.
+MAX_FINISHED_JOBS = 32
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="playlist-job")
+_jobs = OrderedDict()
+_lock = threading.Lock()
+
+
+class Job:
+    """
+    Background unit of work shared by every session that asks for the same key.
+    The worker appends partial results to `records` so sessions can show progress.
+    """
+
+    def __init__(self, key, total=0):
+        self.key = key
+        self.total = total
+        self.records = []
+        self.status = RUNNING
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status != RUNNING
+
+
+def _run(job, work):
+    try:
+        job.result = work(job)
+        job.status = DONE
+    except Exception as e:
+        job.error = str(e)
+        job.status = FAILED
+    job.finished_at = time.time()
+
+
+def _prune():
+    finished = [key for key, job in _jobs.items() if job.finished]
+    for key in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        del _jobs[key]
+
+
+def submit_job(key, work, total=0):
+    """
+    Run work(job) on the worker pool, unless a job with the same key is already
+    running or has finished successfully, in which case that job is returned.
+    The work runs independently of the Streamlit script thread, so it survives
+    reruns and browser disconnects.
+    """
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and job.status != FAILED:
+            _jobs.move_to_end(key)
+            return job
+        job = Job(key, total)
+        _jobs[key] = job
+        _prune()
+    _executor.submit(_run, job, work)
+    return job
+
+
+def get_job(key):
+    with _lock:
+        return _jobs.get(key)
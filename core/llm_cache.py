@@ -0,0 +1,101 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_PATH = "./.cache/llm_cache.db"
+MEMORY_MAX_ENTRIES = 256
+DISK_MAX_ENTRIES = 5000
+# Analyses of the same prompt don't go stale quickly; drop them after a week anyway.
+ENTRY_TTL = 7 * 24 * 3600
+
+_lock = threading.Lock()
+_conn = None
+_memory = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+
+def cache_key(model, prompt, analysis_type):
+    """Content address of an LLM request: the same model, type and prompt map to the same entry."""
+    digest = hashlib.sha256()
+    for part in (model, analysis_type, prompt):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _remember(key, response):
+    _memory[key] = response
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_MAX_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def get_cached_response(model, prompt, analysis_type):
+    key = cache_key(model, prompt, analysis_type)
+    now = time.time()
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return _memory[key]
+
+        conn = _get_conn()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row and now - row[1] <= ENTRY_TTL:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            _remember(key, row[0])
+            _stats["disk_hits"] += 1
+            return row[0]
+
+        _stats["misses"] += 1
+    return None
+
+
+def store_response(model, prompt, analysis_type, response):
+    key = cache_key(model, prompt, analysis_type)
+    now = time.time()
+    with _lock:
+        _remember(key, response)
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, response, now, now)
+        )
+        # Evict expired rows, then the least recently used ones beyond the size cap.
+        evicted = conn.execute("DELETE FROM responses WHERE created_at < ?", (now - ENTRY_TTL,)).rowcount
+        evicted += conn.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (DISK_MAX_ENTRIES,)
+        ).rowcount
+        conn.commit()
+        _stats["stores"] += 1
+        _stats["evictions"] += evicted
+
+
+def llm_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_entries"] = len(_memory)
+    return stats
@@ -1,98 +1,316 @@
 ### File: core/lyrics.py
 import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import jieba
 import numpy as np
 import streamlit as st
 from wordcloud import WordCloud
 from opencc import OpenCC
-import requests
+from core import http_client
+from core.lyrics_cache import get_cached_lyrics, store_lyrics
+from core.circuit_breaker import CircuitBreaker
 
 chinese_converter = OpenCC('s2t')
 
-def get_lyrics_en(artist, title):
+# Upper bound on tracks fetched at once, plus per-provider limits so that
+# neither lyrics.ovh nor NetEase gets hammered by a large playlist.
+LYRICS_MAX_WORKERS = 16
+PROVIDER_CONCURRENCY = {"lyrics.ovh": 8, "netease": 4}
+provider_slots = {name: threading.BoundedSemaphore(limit) for name, limit in PROVIDER_CONCURRENCY.items()}
+provider_breakers = {name: CircuitBreaker(name) for name in PROVIDER_CONCURRENCY}
+
+# Seconds to wait on the first provider before racing the next one; None disables hedging.
+LYRICS_HEDGE_DELAY = 1.5
+hedge_executor = ThreadPoolExecutor(max_workers=LYRICS_MAX_WORKERS * len(PROVIDER_CONCURRENCY), thread_name_prefix="lyrics-hedge")
+
+_stats_lock = threading.Lock()
+_provider_latency = defaultdict(lambda: deque(maxlen=500))
+_provider_wins = defaultdict(int)
+
+# Han, kana and Hangul; lyrics.ovh almost never has these songs.
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+class ProviderUnavailable(Exception):
+    """Provider errored, timed out or is short-circuited by its breaker."""
+
+def fetch_lyrics_ovh(artist, title):
     url = f"https://api.lyrics.ovh/v1/{artist.strip().lower().replace(' ', '%20')}/{title.strip().lower().replace(' ', '%20')}"
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return response.json().get("lyrics")
+    response = http_client.get(url, timeout=5)
+    if response.status_code == 200:
+        return response.json().get("lyrics")
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return None
+
+def fetch_lyrics_netease(artist, title):
+    params = {"s": f"{title} {artist}", "type": 1, "limit": 1}
+    res = http_client.post("http://music.163.com/api/search/get", data=params)
+    result = res.json()
+    if not result.get("result", {}).get("songs"):
         return None
-    except:
+    song_id = result["result"]["songs"][0]["id"]
+    lyric_url = f"http://music.163.com/api/song/lyric?os=pc&id={song_id}&lv=-1&kv=-1&tv=-1"
+    lyric_res = http_client.get(lyric_url)
+    lyrics_json = lyric_res.json()
+    raw_lyrics = lyrics_json.get("lrc", {}).get("lyric", '')
+    if "纯音乐" in raw_lyrics:
+        return None
+    lyrics = re.sub(r'\[\s*\d{2}:\d{2}(\.\d+)?\s*\]', '', raw_lyrics)
+    filtered_lines = [line.strip() for line in lyrics.splitlines() if line.strip() and not re.match(r'(作词|作曲|编曲|制作人).*', line)]
+    simplified_lyric = ' '.join(filtered_lines)
+    traditional_lyric = chinese_converter.convert(simplified_lyric).replace("咪", "夢")
+    return traditional_lyric
+
+LYRICS_PROVIDERS = {"lyrics.ovh": fetch_lyrics_ovh, "netease": fetch_lyrics_netease}
+
+def call_provider(name, artist, title):
+    breaker = provider_breakers[name]
+    if not breaker.allow_request():
+        raise ProviderUnavailable(name)
+    with provider_slots[name]:
+        start = time.perf_counter()
+        try:
+            lyrics = LYRICS_PROVIDERS[name](artist, title)
+        except Exception as e:
+            breaker.record(False, time.perf_counter() - start)
+            raise ProviderUnavailable(name) from e
+        elapsed = time.perf_counter() - start
+        breaker.record(True, elapsed)
+    with _stats_lock:
+        _provider_latency[name].append(elapsed)
+    return lyrics
+
+def provider_stats():
+    """Win counts, latency percentiles (ms) and breaker state per lyrics provider."""
+    with _stats_lock:
+        report = {}
+        for name in PROVIDER_CONCURRENCY:
+            samples = np.array(_provider_latency[name]) * 1000
+            report[name] = {
+                "wins": _provider_wins[name],
+                "calls": len(samples),
+                "p50_ms": round(float(np.percentile(samples, 50)), 1) if len(samples) else None,
+                "p95_ms": round(float(np.percentile(samples, 95)), 1) if len(samples) else None,
+                "p99_ms": round(float(np.percentile(samples, 99)), 1) if len(samples) else None,
+                "breaker": provider_breakers[name].snapshot(),
+            }
+        return report
+
+def get_lyrics_en(artist, title):
+    try:
+        return call_provider("lyrics.ovh", artist, title)
+    except ProviderUnavailable:
         return None
 
 def get_lyrics_zh(artist, title):
-    params = {"s": f"{title} {artist}", "type": 1, "limit": 1}
     try:
-        res = requests.post("http://music.163.com/api/search/get", data=params)
-        result = res.json()
-        if not result.get("result", {}).get("songs"):
-            return None
-        song_id = result["result"]["songs"][0]["id"]
-        lyric_url = f"http://music.163.com/api/song/lyric?os=pc&id={song_id}&lv=-1&kv=-1&tv=-1"
-        lyric_res = requests.get(lyric_url)
-        lyrics_json = lyric_res.json()
-        raw_lyrics = lyrics_json.get("lrc", {}).get("lyric", '')
-        if "纯音乐" in raw_lyrics:
-            return None
-        lyrics = re.sub(r'\[\s*\d{2}:\d{2}(\.\d+)?\s*\]', '', raw_lyrics)
-        filtered_lines = [line.strip() for line in lyrics.splitlines() if line.strip() and not re.match(r'(作词|作曲|编曲|制作人).*', line)]
-        simplified_lyric = ' '.join(filtered_lines)
-        traditional_lyric = chinese_converter.convert(simplified_lyric).replace("咪", "夢")
-        return traditional_lyric
-    except:
+        return call_provider("netease", artist, title)
+    except ProviderUnavailable:
         return None
 
-def get_lyrics_auto(artist, title):
-    return get_lyrics_en(artist, title) or get_lyrics_zh(artist, title)
+def is_cjk(text):
+    return bool(text and CJK_PATTERN.search(text))
 
-def process_tracks(tracks, progress_bar=None):
-    tracks_with_lyrics = []
-    for i, item in enumerate(tracks):
-        if not item.get("track"):
+def provider_order(artist, title):
+    if is_cjk(artist) or is_cjk(title):
+        return ["netease"]
+    return ["lyrics.ovh", "netease"]
+
+def query_providers(names, artist, title):
+    """Ask providers one after another. Returns (winner, lyrics, provider_failed)."""
+    provider_failed = False
+    for name in names:
+        try:
+            lyrics = call_provider(name, artist, title)
+        except ProviderUnavailable:
+            provider_failed = True
+            continue
+        if lyrics:
+            return name, lyrics, provider_failed
+    return None, None, provider_failed
+
+def race_providers(names, artist, title, hedge_delay):
+    """
+    Start the first provider and launch the next one whenever hedge_delay passes
+    without an answer (or the running ones came back empty). The first non-empty
+    result wins; calls still running are cancelled or have their result dropped.
+    """
+    provider_failed = False
+    waiting = list(names)
+    running = {}
+    while waiting or running:
+        if waiting and not running:
+            name = waiting.pop(0)
+            running[hedge_executor.submit(call_provider, name, artist, title)] = name
+        done, _ = wait(running, timeout=hedge_delay if waiting else None, return_when=FIRST_COMPLETED)
+        if not done:
+            name = waiting.pop(0)
+            running[hedge_executor.submit(call_provider, name, artist, title)] = name
             continue
-        track = item["track"]
-        lyrics = get_lyrics_auto(track["artists"][0]["name"], track["name"])
-        tracks_with_lyrics.append({
-            "id": track["id"],
-            "artist": track["artists"][0]["name"],
-            "title": track["name"],
-            "lyrics": lyrics or "Lyrics not found",
-            "preview_url": track.get("preview_url"),
-            "album": track.get("album", {}).get("name", "Unknown Album")
-        })
-        if progress_bar:
-            progress_bar.progress((i + 1) / len(tracks))
-    return tracks_with_lyrics
+        for future in done:
+            name = running.pop(future)
+            try:
+                lyrics = future.result()
+            except ProviderUnavailable:
+                provider_failed = True
+                continue
+            if lyrics:
+                for loser in running:
+                    loser.cancel()
+                return name, lyrics, provider_failed
+    return None, None, provider_failed
+
+def lookup_lyrics(artist, title, track_id=None, hedge_delay=LYRICS_HEDGE_DELAY):
+    """Returns (lyrics, provider_failed); provider_failed means a miss may just be an outage."""
+    found, lyrics = get_cached_lyrics(artist, title, track_id)
+    if found:
+        return lyrics, False
+    names = provider_order(artist, title)
+    if hedge_delay is not None and len(names) > 1:
+        winner, lyrics, provider_failed = race_providers(names, artist, title, hedge_delay)
+    else:
+        winner, lyrics, provider_failed = query_providers(names, artist, title)
+    if winner:
+        with _stats_lock:
+            _provider_wins[winner] += 1
+    # Only cache a miss when every provider actually answered; outages are retried next time.
+    if lyrics or not provider_failed:
+        store_lyrics(artist, title, lyrics, track_id)
+    return lyrics, provider_failed and not lyrics
+
+def get_lyrics_auto(artist, title, track_id=None, hedge_delay=LYRICS_HEDGE_DELAY):
+    return lookup_lyrics(artist, title, track_id, hedge_delay)[0]
 
+def build_track_record(track, lyrics, provider_failed=False):
+    return {
+        "id": track["id"],
+        "artist": track["artists"][0]["name"],
+        "title": track["name"],
+        "lyrics": lyrics or "Lyrics not found",
+        "preview_url": track.get("preview_url"),
+        "album": track.get("album", {}).get("name", "Unknown Album"),
+        # Lets a stored analysis tell outage misses and expired misses apart from real ones.
+        "provider_failed": bool(provider_failed and not lyrics),
+        "checked_at": time.time()
+    }
+
+def track_item(record):
+    """Playlist item for a stored track record, so it can go back through iter_process_tracks."""
+    return {"track": {
+        "id": record.get("id"),
+        "name": record["title"],
+        "artists": [{"name": record["artist"]}],
+        "preview_url": record.get("preview_url"),
+        "album": {"name": record.get("album", "Unknown Album")}
+    }}
+
+def fetch_track_record(track):
+    try:
+        lyrics, provider_failed = lookup_lyrics(track["artists"][0]["name"], track["name"], track.get("id"))
+    except Exception:
+        lyrics, provider_failed = None, True
+    return build_track_record(track, lyrics, provider_failed)
+
+def iter_process_tracks(tracks, max_workers=LYRICS_MAX_WORKERS, known_tracks=None):
+    """
+    Yield track records in playlist order while lyrics are fetched concurrently.
+    `tracks` may be any iterable of playlist items, including a generator that is
+    still paging through Spotify, so page fetching overlaps with lyrics lookups.
+    known_tracks maps track id -> record from an earlier analysis; those are
+    reused as-is instead of being looked up again.
+    """
+    known_tracks = known_tracks or {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    # Bound how far lookups may run ahead of the consumer.
+    max_pending = max_workers * 4
+    try:
+        for item in tracks:
+            track = item.get("track")
+            if not track:
+                continue
+            if track.get("id") in known_tracks:
+                future = Future()
+                future.set_result(known_tracks[track["id"]])
+            else:
+                future = executor.submit(fetch_track_record, track)
+            pending.append(future)
+            while pending and (pending[0].done() or len(pending) >= max_pending):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Word clouds are the slowest part of a tab render; cache them per lyrics text so
+# fragment and full reruns reuse the same image. Read-only, so cache_resource avoids pickling.
+@st.cache_resource(max_entries=32, show_spinner=False)
 def generate_wordcloud(text):
     words = jieba.cut(text)
     return WordCloud(
         width=800, height=400, background_color='white', font_path="TaipeiSansTCBeta-Regular.ttf"
     ).generate(" ".join(words))
 
+@st.cache_resource(max_entries=32, show_spinner=False)
 def generate_wordcloud_for_song(text):
     words = jieba.cut(text)
     return WordCloud(
         width=268, height=229, background_color='white' , font_path="TaipeiSansTCBeta-Regular.ttf"
     ).generate(" ".join(words))
 
+EMOTION_WORDS = {
+    "joy": ["happy", "joy", "delight"],
+    "sadness": ["sad", "cry", "tear"],
+    "anger": ["angry", "rage", "hate"],
+    "fear": ["fear", "scared", "panic"],
+    "love": ["love", "adore", "kiss"],
+    "surprise": ["surprise", "shock", "amazed"]
+}
+EMOTIONS = list(EMOTION_WORDS)
+EMOTION_VOCAB = [w for words in EMOTION_WORDS.values() for w in words]
+# (term, emotion) incidence matrix: term counts @ TERM_EMOTION -> emotion counts.
+TERM_EMOTION = np.array([[float(w in EMOTION_WORDS[e]) for e in EMOTIONS] for w in EMOTION_VOCAB])
+
+def emotion_term_counts(lyrics_list):
+    """
+    (tracks x emotion terms) count matrix. Each lyric is tokenized once; only the
+    emotion vocabulary is kept, so the matrix stays tiny for any playlist size.
+    """
+    counts = np.zeros((len(lyrics_list), len(EMOTION_VOCAB)))
+    for i, lyrics in enumerate(lyrics_list):
+        if lyrics:
+            token_counts = Counter(lyrics.lower().split())
+            counts[i] = [token_counts.get(w, 0) for w in EMOTION_VOCAB]
+    return counts
+
+def compute_sentiment_matrix(lyrics_list):
+    """
+    Mood matrix (tracks x EMOTIONS) for many lyrics in one vectorized pass.
+    Same scale as compute_sentiment_scores: 0.1-0.9 relative to each track's
+    strongest emotion, and a flat 0.5 for tracks without lyrics.
+    """
+    emotion_counts = emotion_term_counts(lyrics_list) @ TERM_EMOTION
+    max_counts = emotion_counts.max(axis=1, keepdims=True)
+    scores = 0.1 + 0.8 * emotion_counts / np.where(max_counts > 0, max_counts, 1)
+    missing = np.array([not lyrics for lyrics in lyrics_list], dtype=bool)
+    scores[missing] = 0.5
+    return scores
+
+def compute_playlist_mood(tracks_with_lyrics):
+    """Average mood over the tracks that have lyrics, as an emotion -> score dict for plot_mood_radar."""
+    lyrics_list = [
+        t['lyrics'] for t in tracks_with_lyrics
+        if t.get('lyrics') and t['lyrics'] != "Lyrics not found"
+    ]
+    if not lyrics_list:
+        return {e: 0.5 for e in EMOTIONS}
+    return dict(zip(EMOTIONS, compute_sentiment_matrix(lyrics_list).mean(axis=0).tolist()))
+
 def compute_sentiment_scores(lyrics):
-    if not lyrics:
-        return {e: 0.5 for e in ["joy", "sadness", "anger", "fear", "love", "surprise"]}
-    text = lyrics.lower()
-    emotion_words = {
-        "joy": ["happy", "joy", "delight"],
-        "sadness": ["sad", "cry", "tear"],
-        "anger": ["angry", "rage", "hate"],
-        "fear": ["fear", "scared", "panic"],
-        "love": ["love", "adore", "kiss"],
-        "surprise": ["surprise", "shock", "amazed"]
-    }
-    counts = {e: 0 for e in emotion_words}
-    for e, words in emotion_words.items():
-        for w in words:
-            counts[e] += text.split().count(w)
-    max_count = max(counts.values()) or 1
-    return {e: 0.1 + 0.8 * (c / max_count) for e, c in counts.items()}
+    return dict(zip(EMOTIONS, compute_sentiment_matrix([lyrics])[0].tolist()))
 
 def plot_mood_radar(mood_dict):
     import matplotlib.pyplot as plt
@@ -0,0 +1,84 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "./.cache/lyrics_cache.db"
+# Found lyrics rarely change; misses are retried sooner in case a provider adds the song.
+HIT_TTL = 30 * 24 * 3600
+MISS_TTL = 24 * 3600
+
+_lock = threading.Lock()
+_conn = None
+_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0}
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS lyrics (
+                key TEXT PRIMARY KEY,
+                lyrics TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+
+def normalize_key(artist, title):
+    """Lowercase, drop bracketed suffixes like "(Remastered)" and collapse whitespace."""
+    def clean(value):
+        value = re.sub(r"[\(\[].*?[\)\]]", "", (value or "").lower())
+        return re.sub(r"\s+", " ", value).strip()
+    return f"{clean(artist)}|{clean(title)}"
+
+
+def _keys(track_id, artist, title):
+    keys = [f"name:{normalize_key(artist, title)}"]
+    if track_id:
+        keys.insert(0, f"id:{track_id}")
+    return keys
+
+
+def get_cached_lyrics(artist, title, track_id=None):
+    """
+    Look up lyrics by Spotify track id first, then by normalized artist/title.
+    Returns (found, lyrics); found with lyrics None is a cached "not found".
+    """
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        for key in _keys(track_id, artist, title):
+            row = conn.execute("SELECT lyrics, fetched_at FROM lyrics WHERE key = ?", (key,)).fetchone()
+            if not row:
+                continue
+            lyrics, fetched_at = row
+            ttl = HIT_TTL if lyrics else MISS_TTL
+            if now - fetched_at > ttl:
+                continue
+            _stats["hits" if lyrics else "negative_hits"] += 1
+            return True, lyrics
+        _stats["misses"] += 1
+    return False, None
+
+
+def store_lyrics(artist, title, lyrics, track_id=None):
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO lyrics (key, lyrics, fetched_at) VALUES (?, ?, ?)",
+            [(key, lyrics or None, now) for key in _keys(track_id, artist, title)]
+        )
+        conn.commit()
+        _stats["stores"] += 1
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats)
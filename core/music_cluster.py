@@ -1,9 +1,122 @@
+import hashlib
+import json
+import math
 import os
 import re
 import streamlit as st
+import streamlit.components.v1 as components
 import networkx as nx
-from pyvis.network import Network
 from collections import defaultdict
+from core.track_index import track_fingerprint
+
+CLUSTER_OPTIONS = ["genre", "mood", "event"]
+
+MOOD_KEYWORDS = {
+    'happy': ['happy', 'joy', 'smile', 'sunshine', 'celebrate', 'yay', 'yay!', 'fun'],
+    'sad': ['cry', 'sad', 'tears', 'alone', 'broken', 'missing', 'goodbye'],
+    'energetic': ['party', 'fire', 'jump', 'run', 'crazy', 'nonstop', 'go', 'burn'],
+    'calm': ['calm', 'peace', 'gentle', 'breeze', 'dream', 'soft', 'slow', 'quiet'],
+    'angry': ['hate', 'rage', 'scream', 'fight', 'burn', 'war', 'revenge']
+}
+
+EVENT_KEYWORDS = {
+    'Party': ['party', 'dance', 'club', 'celebrate', 'lights', 'disco', 'drink'],
+    'Romance': ['love', 'heart', 'kiss', 'romance', 'darling', 'together', 'baby'],
+    'Workout': ['run', 'push', 'sweat', 'lift', 'strong', 'fit', 'power', 'move'],
+    'Relaxation': ['relax', 'calm', 'peace', 'easy', 'chill', 'breathe', 'slow'],
+    'Travel': ['travel', 'journey', 'road', 'fly', 'away', 'adventure', 'explore']
+}
+
+def build_keyword_matcher(*category_maps):
+    """
+    One precompiled alternation over every keyword of every category map, plus a
+    keyword -> [(map index, category)] table, so a single scan scores them all.
+    """
+    targets = defaultdict(list)
+    for i, categories in enumerate(category_maps):
+        for category, keywords in categories.items():
+            for word in keywords:
+                targets[word].append((i, category))
+    # Longest first so e.g. "yay!" wins over "yay" at the same position.
+    alternation = "|".join(re.escape(w) for w in sorted(targets, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternation})\b"), dict(targets)
+
+KEYWORD_PATTERN, KEYWORD_TARGETS = build_keyword_matcher(MOOD_KEYWORDS, EVENT_KEYWORDS)
+
+def score_keywords(lyrics):
+    """Keyword hit counts per category for (MOOD_KEYWORDS, EVENT_KEYWORDS), in one pass over the lyrics."""
+    scores = ({m: 0 for m in MOOD_KEYWORDS}, {e: 0 for e in EVENT_KEYWORDS})
+    for word in KEYWORD_PATTERN.findall(lyrics):
+        for i, category in KEYWORD_TARGETS[word]:
+            scores[i][category] += 1
+    return scores
+
+def top_category(scores, default):
+    # max() keeps the first of equal scores, i.e. dict order breaks ties.
+    return max(scores.items(), key=lambda x: x[1])[0] if any(scores.values()) else default
+
+def determine_genre(track):
+    for key in ("genres", "track_genre", "artist_genres"):
+        candidate = track.get(key)
+        if candidate:
+            if isinstance(candidate, list) and len(candidate) > 0:
+                return candidate[0]
+            elif isinstance(candidate, str):
+                return candidate
+
+    danceability   = float(track.get("danceability", 0.5))
+    energy         = float(track.get("energy", 0.5))
+    valence        = float(track.get("valence", 0.5))
+    tempo          = float(track.get("tempo", 120))
+    instrumental   = float(track.get("instrumentalness", 0))
+    acousticness   = float(track.get("acousticness", 0))
+    loudness       = float(track.get("loudness", -10))
+
+    if instrumental > 0.6 and energy > 0.6:
+        return "Electronic"
+    if acousticness > 0.7 and energy < 0.5:
+        return "Acoustic"
+    if danceability > 0.7 and energy > 0.7 and tempo > 115:
+        return "Dance/Pop"
+    if energy > 0.75 and loudness > -6 and tempo > 120:
+        return "Rock"
+    if danceability > 0.6 and 80 < tempo < 120 and energy > 0.65:
+        return "Hip-Hop"
+    if energy < 0.5 and acousticness > 0.4:
+        return "Indie/Alternative"
+    if energy < 0.6 and valence > 0.5 and acousticness < 0.5:
+        return "R&B/Soul"
+    if danceability > 0.4 and valence > 0.4 and energy > 0.4:
+        return "Pop"
+
+    return "Other"
+
+def classify_tracks(tracks_with_lyrics):
+    """
+    Genre, mood and event of every track, computed together.
+    Returns a dict mapping track id -> {"title", "artist", "genre", "mood", "event"}.
+    """
+    track_classes = {}
+    for t in tracks_with_lyrics:
+        tid = t.get("id", t.get("title"))
+        mood_scores, event_scores = score_keywords(t.get("lyrics", "").lower())
+        track_classes[tid] = {
+            "title": t.get("title", "Unknown Title"),
+            "artist": t.get("artist", "Unknown Artist"),
+            "genre": determine_genre(t),
+            "mood": top_category(mood_scores, "neutral"),
+            "event": top_category(event_scores, "Other")
+        }
+    return track_classes
+
+def get_track_classes(tracks_with_lyrics):
+    """classify_tracks for the current playlist, redone only when its track list changes."""
+    fingerprint = track_fingerprint(tracks_with_lyrics)
+    cached = st.session_state.get("track_classes")
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, classify_tracks(tracks_with_lyrics))
+        st.session_state["track_classes"] = cached
+    return cached[1]
 
 def cluster_tracks(tracks_with_lyrics, cluster_by="genre"):
     """
@@ -18,153 +131,205 @@ def cluster_tracks(tracks_with_lyrics, cluster_by="genre"):
     clusters = defaultdict(list)
     track_attrs = {}
 
-    def count_keyword_matches(lyrics, keywords):
-        return sum(len(re.findall(rf'\b{re.escape(word)}\b', lyrics)) for word in keywords)
-    
-    mood_keywords = {
-        'happy': ['happy', 'joy', 'smile', 'sunshine', 'celebrate', 'yay', 'yay!', 'fun'],
-        'sad': ['cry', 'sad', 'tears', 'alone', 'broken', 'missing', 'goodbye'],
-        'energetic': ['party', 'fire', 'jump', 'run', 'crazy', 'nonstop', 'go', 'burn'],
-        'calm': ['calm', 'peace', 'gentle', 'breeze', 'dream', 'soft', 'slow', 'quiet'],
-        'angry': ['hate', 'rage', 'scream', 'fight', 'burn', 'war', 'revenge']
-    }
-
-    event_keywords = {
-        'Party': ['party', 'dance', 'club', 'celebrate', 'lights', 'disco', 'drink'],
-        'Romance': ['love', 'heart', 'kiss', 'romance', 'darling', 'together', 'baby'],
-        'Workout': ['run', 'push', 'sweat', 'lift', 'strong', 'fit', 'power', 'move'],
-        'Relaxation': ['relax', 'calm', 'peace', 'easy', 'chill', 'breathe', 'slow'],
-        'Travel': ['travel', 'journey', 'road', 'fly', 'away', 'adventure', 'explore']
-    }
-
-    def determine_genre(track):
-        for key in ("genres", "track_genre", "artist_genres"):
-            candidate = track.get(key)
-            if candidate:
-                if isinstance(candidate, list) and len(candidate) > 0:
-                    return candidate[0]
-                elif isinstance(candidate, str):
-                    return candidate
-
-        danceability   = float(track.get("danceability", 0.5))
-        energy         = float(track.get("energy", 0.5))
-        valence        = float(track.get("valence", 0.5))
-        tempo          = float(track.get("tempo", 120))
-        instrumental   = float(track.get("instrumentalness", 0))
-        acousticness   = float(track.get("acousticness", 0))
-        loudness       = float(track.get("loudness", -10))
-
-        if instrumental > 0.6 and energy > 0.6:
-            return "Electronic"
-        if acousticness > 0.7 and energy < 0.5:
-            return "Acoustic"
-        if danceability > 0.7 and energy > 0.7 and tempo > 115:
-            return "Dance/Pop"
-        if energy > 0.75 and loudness > -6 and tempo > 120:
-            return "Rock"
-        if danceability > 0.6 and 80 < tempo < 120 and energy > 0.65:
-            return "Hip-Hop"
-        if energy < 0.5 and acousticness > 0.4:
-            return "Indie/Alternative"
-        if energy < 0.6 and valence > 0.5 and acousticness < 0.5:
-            return "R&B/Soul"
-        if danceability > 0.4 and valence > 0.4 and energy > 0.4:
-            return "Pop"
-
-        return "Other"
-
-    for t in tracks_with_lyrics:
-        tid = t.get("id", t.get("title"))
-        title = t.get("title", "Unknown Title")
-        artist = t.get("artist", "Unknown Artist")
-        lyrics = t.get("lyrics", "").lower()
-
-        # Determine attribute value based on cluster_by
-        if cluster_by == "mood":
-            mood_scores = {
-                mood: count_keyword_matches(lyrics, keywords)
-                for mood, keywords in mood_keywords.items()
-            }
-            attr_value = max(mood_scores.items(), key=lambda x: x[1])[0] if any(mood_scores.values()) else "neutral"
-
-        elif cluster_by == "genre":
-            attr_value = determine_genre(t)
-
-        elif cluster_by == "event":
-            event_scores = {
-                event: count_keyword_matches(lyrics, keywords)
-                for event, keywords in event_keywords.items()
-            }
-            attr_value = max(event_scores.items(), key=lambda x: x[1])[0] if any(event_scores.values()) else "Other"
-
-        else:
-            attr_value = "Unknown"
-
+    for tid, classes in get_track_classes(tracks_with_lyrics).items():
+        attr_value = classes.get(cluster_by, "Unknown")
         clusters[attr_value].append(tid)
         track_attrs[tid] = {
-            "title": title,
-            "artist": artist,
+            "title": classes["title"],
+            "artist": classes["artist"],
             cluster_by: attr_value
         }
 
     return clusters, track_attrs
 
-def build_track_graph(clusters, track_attrs):
+GRAPH_MODES = {"Cluster hubs": "hub", "Nearest neighbours": "knn"}
+# Neighbours linked on each side of a track within its cluster in "knn" mode,
+# so no track has more than 2 * KNN_NEIGHBOURS edges.
+KNN_NEIGHBOURS = 2
+MAX_GRAPH_EDGES = 20000
+
+def cluster_node_id(attr_value):
+    return f"cluster:{attr_value}"
+
+def build_track_graph(clusters, track_attrs, mode="hub", k=KNN_NEIGHBOURS, max_edges=MAX_GRAPH_EDGES):
     """
-    Build NetworkX graph connecting tracks that share the same cluster attribute.
+    Build a sparse NetworkX graph of tracks sharing the same cluster attribute.
+    mode "hub" adds one node per cluster and links each track to it; mode "knn"
+    links each track to its k following tracks in the cluster (wrapping around).
+    Either way the edge count grows linearly with the playlist. Edges beyond
+    max_edges are skipped and counted in G.graph["dropped_edges"].
     """
-    G = nx.Graph()
+    G = nx.Graph(mode=mode, dropped_edges=0)
 
     # Add nodes
     for tid, attrs in track_attrs.items():
         G.add_node(tid, label=attrs["title"], artist=attrs["artist"])
 
-    # Connect tracks in the same cluster
+    # Counted here: G.number_of_edges() walks every node, which would make the build quadratic.
+    edge_count = 0
+
+    def link(u, v):
+        nonlocal edge_count
+        if edge_count >= max_edges:
+            G.graph["dropped_edges"] += 1
+        else:
+            G.add_edge(u, v, weight=1)
+            edge_count += 1
+
     for attr_value, track_ids in clusters.items():
-        for i, tid1 in enumerate(track_ids):
-            for tid2 in track_ids[i+1:]:
-                if G.has_edge(tid1, tid2):
-                    G[tid1][tid2]["weight"] += 1
-                else:
-                    G.add_edge(tid1, tid2, weight=1)
+        if mode == "hub":
+            hub = cluster_node_id(attr_value)
+            G.add_node(hub, label=str(attr_value), artist="", cluster=True, size=len(track_ids))
+            for tid in track_ids:
+                link(hub, tid)
+        else:
+            n = len(track_ids)
+            for i, tid in enumerate(track_ids):
+                # Offsets past n // 2 would repeat pairs already linked from the other side.
+                for step in range(1, min(k, n // 2) + 1):
+                    if step * 2 == n and i >= step:
+                        continue
+                    link(tid, track_ids[(i + step) % n])
 
     return G
 
-def visualize_graph_networkx(G, height="600px", width="100%"):
-    net = Network(height=height, width=width, notebook=False)
+GRAPH_HEIGHT = 600
+# Physics stays off: positions come from compute_layout, so the browser only draws.
+GRAPH_OPTIONS = {
+    "physics": {"enabled": False},
+    "edges": {"smooth": False, "color": {"opacity": 0.4}},
+    "interaction": {"hideEdgesOnDrag": True, "tooltipDelay": 200}
+}
+# Above this many tracks every cluster starts collapsed into a single node.
+LOD_THRESHOLD = 300
+NODE_SPACING = 40
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# Static component page in lib/ that loads the bundled vis-network assets, so the
+# browser fetches and caches them once and each render only ships graph data.
+music_web_component = components.declare_component(
+    "music_web", path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+)
 
-    net.from_nx(G)
+def graph_key(clusters, mode, options):
+    """Hash of the cluster assignment and layout options identifying a rendered graph."""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([mode, options], sort_keys=True).encode("utf-8"))
+    for attr_value in sorted(clusters, key=str):
+        digest.update(json.dumps([str(attr_value), clusters[attr_value]]).encode("utf-8"))
+    return digest.hexdigest()
 
-    for node in net.nodes:
-        node['title'] = f"{node['label']} - Artist: {G.nodes[node['id']]['artist']}"
-        node['shape'] = 'dot'
-        node['size'] = 15
+def compute_layout(clusters):
+    """
+    Positions for every track and cluster node, linear in the number of tracks.
+    Tracks sit on a sunflower spiral around their cluster node, and cluster nodes
+    are spread around a ring big enough for every spiral.
+    """
+    positions = {}
+    ordered = sorted(clusters.items(), key=lambda x: len(x[1]), reverse=True)
+    spans = [2 * NODE_SPACING * (math.sqrt(len(track_ids) + 1) + 1) for _, track_ids in ordered]
+    circumference = sum(spans)
+    # Some slack on the ring radius, since neighbours are a chord apart, not an arc.
+    ring = 1.25 * circumference / (2 * math.pi) if len(ordered) > 1 else 0
+    angle = 0.0
+    for (attr_value, track_ids), span in zip(ordered, spans):
+        theta = angle + math.pi * span / circumference
+        angle += 2 * math.pi * span / circumference
+        cx, cy = ring * math.cos(theta), ring * math.sin(theta)
+        positions[cluster_node_id(attr_value)] = (cx, cy)
+        for i, tid in enumerate(track_ids):
+            r = NODE_SPACING * math.sqrt(i + 1)
+            positions[tid] = (cx + r * math.cos(i * GOLDEN_ANGLE), cy + r * math.sin(i * GOLDEN_ANGLE))
+    return positions
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def build_graph_view(key, _clusters, _track_attrs, mode):
+    """
+    Graph and layout for one cluster assignment, cached by its key so an unchanged
+    graph is never rebuilt or laid out again. Arguments starting with _ are not hashed.
+    """
+    G = build_track_graph(_clusters, _track_attrs, mode=mode)
+    return {
+        "key": key,
+        "graph": G,
+        "positions": compute_layout(_clusters),
+        "clusters": {cluster_node_id(v): track_ids for v, track_ids in _clusters.items()},
+        "labels": {cluster_node_id(v): str(v) for v in _clusters},
+        "track_count": len(_track_attrs)
+    }
 
-    net.show_buttons(filter_=['physics'])
-    net.repulsion(node_distance=150, central_gravity=0.2, spring_length=100, spring_strength=0.05)
+def get_expanded_clusters(view):
+    """
+    Cluster nodes currently expanded in this session. Small graphs start fully
+    expanded, large ones fully collapsed; clicks on cluster nodes in the component
+    arrive as {"toggle", "nonce"} values under the "music_web" key.
+    """
+    event = st.session_state.get("music_web")
+    state = st.session_state.get("music_web_expanded")
+    if state is None or state["key"] != view["key"]:
+        expanded = set(view["clusters"]) if view["track_count"] <= LOD_THRESHOLD else set()
+        state = {"key": view["key"], "clusters": expanded, "nonce": event and event.get("nonce")}
+        st.session_state["music_web_expanded"] = state
+    if event and event.get("nonce") != state["nonce"]:
+        state["nonce"] = event.get("nonce")
+        state["clusters"] ^= {event.get("toggle")} & set(view["clusters"])
+    return state["clusters"]
 
-    # Save to temporary html file and read content for embedding
-    parent_folder = os.path.dirname(os.path.abspath(__file__))
-    if not os.path.exists("/tmp"):
-        os.makedirs("/tmp")
-    path = os.path.join(parent_folder, "/tmp/track_graph.html")
-    net.save_graph(path)
-    with open(path, 'r', encoding='utf-8') as f:
-        html = f.read()
-    return html
+def visualize_graph_networkx(view, expanded, options=GRAPH_OPTIONS):
+    """
+    vis-network payload for the visible part of the graph: collapsed clusters as a
+    single node, expanded ones as their cluster node plus tracks and edges.
+    """
+    G, positions = view["graph"], view["positions"]
+    nodes, edges = [], []
+    for cid, track_ids in view["clusters"].items():
+        x, y = positions[cid]
+        label = view["labels"][cid]
+        if cid not in expanded:
+            nodes.append({
+                "id": cid, "label": f"{label} ({len(track_ids)})", "x": x, "y": y, "cluster": True,
+                "title": f"{label}: {len(track_ids)} tracks, click to expand",
+                "shape": "dot", "size": min(15 + 3 * math.sqrt(len(track_ids)), 80)
+            })
+            continue
+        nodes.append({
+            "id": cid, "label": label, "x": x, "y": y, "cluster": True,
+            "title": f"{label}: {len(track_ids)} tracks, click to collapse",
+            "shape": "diamond", "size": 30
+        })
+        for tid in track_ids:
+            attrs = G.nodes[tid]
+            tx, ty = positions[tid]
+            nodes.append({
+                "id": tid, "label": attrs['label'], "x": tx, "y": ty,
+                "title": f"{attrs['label']} - Artist: {attrs['artist']}",
+                "shape": "dot", "size": 15
+            })
+        # Tracks only link within their own cluster (directly or through its hub).
+        edges.extend({"from": u, "to": v} for u, v in G.edges(track_ids))
+    key = view["key"] + ":" + hashlib.sha1(json.dumps(sorted(expanded)).encode("utf-8")).hexdigest()
+    return {"key": key, "nodes": nodes, "edges": edges, "options": options}
 
 def render_music_clusters_graph(tracks_with_lyrics):
     st.subheader("Music Clusters Visualization")
-    cluster_options = ["genre", "mood", "event"]
-    cluster_by = st.selectbox("Select clustering criterion", cluster_options)
+    cluster_by = st.selectbox("Select clustering criterion", CLUSTER_OPTIONS)
+    graph_mode = st.radio("Graph layout", list(GRAPH_MODES), horizontal=True)
 
     if not tracks_with_lyrics:
         st.info("Please load a playlist first to see music clusters.")
         return
 
     clusters, track_attrs = cluster_tracks(tracks_with_lyrics, cluster_by=cluster_by)
-    G = build_track_graph(clusters, track_attrs)
-    html = visualize_graph_networkx(G)
-    st.markdown(f"### Clustered by: {cluster_by.capitalize()}")
-    st.components.v1.html(html, height=600, scrolling=True)
+    mode = GRAPH_MODES[graph_mode]
+    view = build_graph_view(graph_key(clusters, mode, GRAPH_OPTIONS), clusters, track_attrs, mode)
+    expanded = get_expanded_clusters(view)
+    G = view["graph"]
 
+    st.markdown(f"### Clustered by: {cluster_by.capitalize()}")
+    st.caption(
+        f"{len(track_attrs)} tracks, {len(clusters)} clusters ({len(expanded)} expanded), "
+        f"{G.number_of_edges()} edges. Click a cluster node to expand or collapse it."
+    )
+    if G.graph["dropped_edges"]:
+        st.warning(f"Graph capped at {MAX_GRAPH_EDGES} edges; {G.graph['dropped_edges']} more were left out.")
+    music_web_component(graph=visualize_graph_networkx(view, expanded), height=GRAPH_HEIGHT, key="music_web", default=None)
@@ -1,40 +1,57 @@
 import spotipy
 import os
+import time
 import streamlit as st
 from spotipy.oauth2 import SpotifyOAuth
-from core.lyrics import process_tracks
-from core.autogen import setup_autogen_agents
+from core.http_client import new_session
+from core.ingest import ingest_playlist
+from core.pagination import iter_pages, PLAYLIST_TRACK_FIELDS, PLAYLIST_DETAIL_FIELDS, PLAYLIST_PAGE_SIZE, USER_PLAYLISTS_PAGE_SIZE
+
+# How long a validated client and its profile are trusted before current_user() is called again.
+PROFILE_TTL = 300
+# How long the user's playlist list is reused before the library is paged through again.
+PLAYLISTS_TTL = 300
 
 def logout_spotify():
     try:
         if os.path.exists(".spotify_cache"):
             os.remove(".spotify_cache")
-        for key in ['token_info', 'playlist_data', 'tracks_with_lyrics', 'agents', 'analysis_ready']:
+        for key in ['token_info', 'playlist_data', 'tracks_with_lyrics', 'agents', 'analysis_ready',
+                    'spotify_auth', 'spotify_client', 'spotify_user', 'spotify_user_checked_at', 'user_playlists']:
             if key in st.session_state:
                 del st.session_state[key]
     except Exception as e:
         st.error(f"Error during logout: {e}")
 
 def get_spotify_auth():
+    """OAuth manager for the current credentials, built once per session and reused across reruns."""
     try:
         # Explicitly access secrets and verify they exist
         client_id = st.session_state.get('spotify_client_id')
         client_secret = st.session_state.get('spotify_client_secret')
         redirect_uri = st.secrets["SPOTIFY_REDIRECT_URI"]
-        print(client_id, client_secret, redirect_uri)  # Debugging line
-        
+
         if not all([client_id, client_secret, redirect_uri]):
             return None
-            
-        return SpotifyOAuth(
+
+        credentials = (client_id, client_secret, redirect_uri)
+        cached = st.session_state.get('spotify_auth')
+        if cached and cached[0] == credentials:
+            return cached[1]
+
+        # spotipy closes its session when the manager is garbage-collected, so it gets its own.
+        sp_oauth = SpotifyOAuth(
             client_id=client_id,
             client_secret=client_secret,
             redirect_uri=redirect_uri,
             scope="playlist-read-private playlist-read-collaborative user-read-playback-state user-modify-playback-state user-read-currently-playing",
             cache_path="./.spotify_cache",  # Explicitly set cache path
             username=None,  # Set to None to use the authenticated user's ID
-            show_dialog=True
+            show_dialog=True,
+            requests_session=new_session()
         )
+        st.session_state['spotify_auth'] = (credentials, sp_oauth)
+        return sp_oauth
     except Exception as e:
         st.error(f"Error accessing Spotify credentials: {str(e)}")
         return None
@@ -44,6 +61,11 @@ def get_spotify_client():
     if not sp_oauth:
         return None
 
+    sp = st.session_state.get('spotify_client')
+    checked_at = st.session_state.get('spotify_user_checked_at', 0)
+    if sp and sp.auth_manager is sp_oauth and time.time() - checked_at < PROFILE_TTL:
+        return sp
+
     try:
         token_info = sp_oauth.get_cached_token()
 
@@ -68,8 +90,10 @@ def get_spotify_client():
             """, unsafe_allow_html=True)
 
         if token_info:
-            sp = spotipy.Spotify(auth_manager=sp_oauth)
-            print("Spotify client created successfully")  # Debugging line
+            # Past the TTL the same client is just re-validated below.
+            if not sp or sp.auth_manager is not sp_oauth:
+                sp = spotipy.Spotify(auth_manager=sp_oauth, requests_session=new_session())
+                print("Spotify client created successfully")  # Debugging line
             try:
                 user = sp.current_user()
                 print("User info retrieved:", user)  # Debugging line
@@ -83,6 +107,9 @@ def get_spotify_client():
                 logout_spotify()
                 return None
 
+            st.session_state['spotify_client'] = sp
+            st.session_state['spotify_user'] = user
+            st.session_state['spotify_user_checked_at'] = time.time()
             return sp
 
         return None
@@ -91,13 +118,43 @@ def get_spotify_client():
         st.error(f"Authentication error: {str(e)}")
         return None
 
+def get_current_user():
+    """Profile validated by get_spotify_client, so callers don't each call sp.current_user()."""
+    return st.session_state.get('spotify_user')
+
+def iter_playlist_items(sp, playlist_id):
+    """Yield every item of a playlist, not just the first 100, fetching pages concurrently."""
+    def fetch_page(offset):
+        return sp.playlist_items(playlist_id, fields=PLAYLIST_TRACK_FIELDS, limit=PLAYLIST_PAGE_SIZE, offset=offset, additional_types=("track",))
+    for page in iter_pages(fetch_page, PLAYLIST_PAGE_SIZE):
+        yield from page["items"]
+
+def get_user_playlists(sp, on_progress=None):
+    """
+    All of the user's playlists, not just the first 50. Kept in session state for
+    PLAYLISTS_TTL so reruns don't page through the whole library again;
+    on_progress(fetched, total) is only called when it is actually fetched.
+    """
+    user_id = (st.session_state.get('spotify_user') or {}).get('id')
+    cached = st.session_state.get('user_playlists')
+    if cached and cached['user_id'] == user_id and time.time() - cached['fetched_at'] < PLAYLISTS_TTL:
+        return cached['playlists']
+
+    def fetch_page(offset):
+        return sp.current_user_playlists(limit=USER_PLAYLISTS_PAGE_SIZE, offset=offset)
+    playlists = []
+    for page in iter_pages(fetch_page, USER_PLAYLISTS_PAGE_SIZE, on_progress=on_progress):
+        playlists.extend(pl for pl in page["items"] if pl)
+    st.session_state['user_playlists'] = {"user_id": user_id, "playlists": playlists, "fetched_at": time.time()}
+    return playlists
+
 def playlist_oauth_flow():
     try:
         sp = get_spotify_client()
         if sp:
             st.session_state['token_info'] = True
             user_col, button_col = st.columns([3, 1])
-            user = sp.current_user()
+            user = get_current_user()
             with user_col:
                 st.success(f"Logged in as: {user['display_name']}")
             with button_col:
@@ -105,9 +162,9 @@ def playlist_oauth_flow():
                     logout_spotify()
                     st.rerun()
 
-            playlists = sp.current_user_playlists()
-            playlist_names = [pl["name"] for pl in playlists["items"]]
-            playlist_ids = [pl["id"] for pl in playlists["items"]]
+            playlists = get_user_playlists(sp)
+            playlist_names = [pl["name"] for pl in playlists]
+            playlist_ids = [pl["id"] for pl in playlists]
 
             if not playlist_names:
                 st.warning("No playlists found in your account.")
@@ -123,23 +180,13 @@ def playlist_oauth_flow():
                 st.session_state['active_tab'] = 0
                 with st.spinner("Fetching playlist data..."):
                     try:
-                        playlist_data = sp.playlist(selected_id)
-                        tracks = sp.playlist_tracks(selected_id)
+                        playlist_data = sp.playlist(selected_id, fields=PLAYLIST_DETAIL_FIELDS)
                     except Exception:
                         st.error("Failed to connect to Spotify. Please check your authentication.")
                         return
 
-                    with st.spinner(f"Processing {playlist_data.get('tracks', {}).get('total', 0)} tracks..."):
-                        progress_bar = st.progress(0)
-                        tracks_with_lyrics = process_tracks(tracks['items'], progress_bar)
-                    with st.spinner("Setting up AutoGen agents..."):
-                        agents = setup_autogen_agents(st.session_state.get('gemini_api_key'))
-
-                    st.session_state['playlist_data'] = playlist_data
-                    st.session_state['tracks_with_lyrics'] = tracks_with_lyrics
-                    st.session_state['agents'] = agents
-                    st.session_state['analysis_ready'] = True
-                    st.rerun()
+                ingest_playlist(playlist_data, iter_playlist_items(sp, selected_id))
+                st.rerun()
 
     except Exception as e:
         st.error(f"Error in OAuth flow: {str(e)}")
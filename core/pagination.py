@@ -0,0 +1,42 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# Only the fields build_track_record reads; keeps each page a fraction of the full payload.
+PLAYLIST_TRACK_FIELDS = "total,items(track(id,name,preview_url,artists(name),album(name)))"
+PLAYLIST_DETAIL_FIELDS = "id,name,description,images,owner(display_name),snapshot_id,tracks(total)"
+PLAYLIST_PAGE_SIZE = 100
+USER_PLAYLISTS_PAGE_SIZE = 50
+
+
+def iter_pages(fetch_page, page_size, max_workers=4, on_progress=None):
+    """
+    Walk an offset-paginated Spotify endpoint.
+    fetch_page(offset) must return the page JSON. `total` is read from the first
+    page and the remaining offsets are fetched concurrently; pages are yielded in
+    order with at most max_workers * 2 requests in flight, so memory stays bounded
+    however slowly the caller consumes them.
+    on_progress(fetched_items, total), if given, is called after every page.
+    """
+    first = fetch_page(0)
+    total = first.get("total") or 0
+    fetched = len(first.get("items", []))
+    if on_progress:
+        on_progress(fetched, total)
+    yield first
+    offsets = iter(range(page_size, total, page_size))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        window = deque(executor.submit(fetch_page, offset) for offset in islice(offsets, max_workers * 2))
+        while window:
+            page = window.popleft().result()
+            offset = next(offsets, None)
+            if offset is not None:
+                window.append(executor.submit(fetch_page, offset))
+            fetched += len(page.get("items", []))
+            if on_progress:
+                on_progress(fetched, total)
+            yield page
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
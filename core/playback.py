@@ -1,4 +1,4 @@
-import requests
+from core import http_client
 import streamlit as st
 from core.oauth_flow import get_spotify_client
 
@@ -43,7 +43,7 @@ def playback():
 def get_current_playback_uri(access_token):
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
-        response = requests.get("https://api.spotify.com/v1/me/player/currently-playing", headers=headers)
+        response = http_client.get("https://api.spotify.com/v1/me/player/currently-playing", headers=headers)
         print("Response status code:", response.status_code)  # Debugging line
         print("Response content:", response.content)  # Debugging line
         if response.status_code == 200:
@@ -68,7 +68,7 @@ def play_track(access_token, track_uri=None, device_id=None):
     params = {"device_id": device_id} if device_id else {}
 
     try:
-        response = requests.put(
+        response = http_client.put(
             "https://api.spotify.com/v1/me/player/play",
             headers=headers,
             json=payload,
@@ -89,7 +89,7 @@ def pause_playback(access_token, device_id=None):
         url += f"?device_id={device_id}"
 
     try:
-        response = requests.put(url, headers=headers)
+        response = http_client.put(url, headers=headers)
         if response.status_code in [200, 204]:
             return "⏸️ Playback paused"
         else:
@@ -101,7 +101,7 @@ def pause_playback(access_token, device_id=None):
 def next_track(access_token):
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
-        response = requests.post("https://api.spotify.com/v1/me/player/next", headers=headers)
+        response = http_client.post("https://api.spotify.com/v1/me/player/next", headers=headers)
         if response.status_code in [200, 204]:
             return "⏭️ Skipped to next track"
         else:
@@ -113,7 +113,7 @@ def next_track(access_token):
 def get_current_playback(access_token):
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
-        response = requests.get("https://api.spotify.com/v1/me/player/currently-playing", headers=headers)
+        response = http_client.get("https://api.spotify.com/v1/me/player/currently-playing", headers=headers)
         if response.status_code == 200:
             data = response.json()
             item = data.get("item")
@@ -136,7 +136,7 @@ def search_tracks(access_token, query, limit=5, offset=0):
     }
 
     try:
-        response = requests.get("https://api.spotify.com/v1/search", headers=headers, params=params)
+        response = http_client.get("https://api.spotify.com/v1/search", headers=headers, params=params)
         response.raise_for_status()
         results = response.json()["tracks"]["items"]
         return results  # list of track dicts
@@ -152,7 +152,7 @@ def add_track_to_queue(access_token, track_uri, device_id=None):
         params["device_id"] = device_id
 
     try:
-        response = requests.post("https://api.spotify.com/v1/me/player/queue", headers=headers, params=params)
+        response = http_client.post("https://api.spotify.com/v1/me/player/queue", headers=headers, params=params)
         if response.status_code in [200, 204]:
             return "✅ Added to queue"
         else:
@@ -163,7 +163,7 @@ def add_track_to_queue(access_token, track_uri, device_id=None):
 def get_playback_queue(access_token):
     headers = {"Authorization": f"Bearer " + access_token}
     try:
-        response = requests.get("https://api.spotify.com/v1/me/player/queue", headers=headers)
+        response = http_client.get("https://api.spotify.com/v1/me/player/queue", headers=headers)
         response.raise_for_status()
         data = response.json()
         return data.get("queue", [])  # List of track objects
@@ -182,7 +182,7 @@ def create_playlist(access_token, user_id, name="My AI Playlist", description="C
         "public": False
     }
     try:
-        response = requests.post(
+        response = http_client.post(
             f"https://api.spotify.com/v1/users/{user_id}/playlists",
             headers=headers,
             json=payload
@@ -202,7 +202,7 @@ def add_track_to_playlist(access_token, playlist_id, track_uri):
         "uris": [track_uri]
     }
     try:
-        response = requests.post(
+        response = http_client.post(
             f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
             headers=headers,
             json=payload
@@ -221,7 +221,7 @@ def play_playlist(access_token: str, playlist_id: str):
     data = {
         "context_uri": f"spotify:playlist:{playlist_id}"
     }
-    response = requests.put(
+    response = http_client.put(
         "https://api.spotify.com/v1/me/player/play",
         headers=headers,
         json=data
@@ -0,0 +1,53 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+STORE_PATH = "./.cache/playlist_store.db"
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(STORE_PATH, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS playlists (
+                playlist_id TEXT PRIMARY KEY,
+                snapshot_id TEXT NOT NULL,
+                tracks TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+
+def load_playlist_snapshot(playlist_id):
+    """Returns {"snapshot_id", "tracks", "updated_at"} from the last analysis of this playlist, or None."""
+    if not playlist_id:
+        return None
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT snapshot_id, tracks, updated_at FROM playlists WHERE playlist_id = ?", (playlist_id,)
+        ).fetchone()
+    if not row:
+        return None
+    return {"snapshot_id": row[0], "tracks": json.loads(row[1]), "updated_at": row[2]}
+
+
+def save_playlist_snapshot(playlist_id, snapshot_id, tracks_with_lyrics):
+    if not playlist_id or not snapshot_id:
+        return
+    payload = json.dumps(tracks_with_lyrics, ensure_ascii=False)
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO playlists (playlist_id, snapshot_id, tracks, updated_at) VALUES (?, ?, ?, ?)",
+            (playlist_id, snapshot_id, payload, time.time())
+        )
+        conn.commit()
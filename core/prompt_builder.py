@@ -0,0 +1,82 @@
+from collections import Counter
+from core.lyrics import CJK_PATTERN
+from core.track_index import get_track_index, tokenize
+
+# Rough token budget for the playlist part of a chat system message.
+PLAYLIST_CONTEXT_TOKENS = 3000
+# Share of the budget given to the playlist digest; the rest goes to relevant tracks.
+DIGEST_SHARE = 0.4
+RELEVANT_TRACKS = 5
+LYRICS_EXCERPT_CHARS = 600
+
+
+def estimate_tokens(text):
+    """About one token per CJK character and per four characters of other text."""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def build_playlist_digest(tracks_with_lyrics, budget):
+    with_lyrics = sum(1 for t in tracks_with_lyrics if t.get("lyrics") and t["lyrics"] != "Lyrics not found")
+    top_artists = Counter(t["artist"] for t in tracks_with_lyrics).most_common(10)
+    header = (
+        f"The user's playlist has {len(tracks_with_lyrics)} tracks ({with_lyrics} with lyrics). "
+        f"Top artists: {', '.join(f'{artist} ({count})' for artist, count in top_artists)}.\n"
+        "Tracks: "
+    )
+    used = estimate_tokens(header)
+    titles = []
+    for t in tracks_with_lyrics:
+        entry = f"{t['title']} - {t['artist']}"
+        cost = estimate_tokens(entry) + 1
+        if used + cost > budget:
+            break
+        titles.append(entry)
+        used += cost
+    remaining = len(tracks_with_lyrics) - len(titles)
+    digest = header + "; ".join(titles)
+    if remaining:
+        digest += f"; ... and {remaining} more"
+    return digest
+
+
+def lyrics_excerpt(lyrics, question, length=LYRICS_EXCERPT_CHARS):
+    """Window of the lyrics around the first word of the question they contain."""
+    if len(lyrics) <= length:
+        return lyrics
+    lowered = lyrics.lower()
+    positions = [lowered.find(token) for token in tokenize(question)]
+    positions = [p for p in positions if p >= 0]
+    start = max(min(positions) - length // 3, 0) if positions else 0
+    return lyrics[start:start + length]
+
+
+def build_relevant_tracks(tracks_with_lyrics, question, budget):
+    sections = []
+    used = 0
+    for _, track in get_track_index(tracks_with_lyrics).search(question, limit=RELEVANT_TRACKS):
+        lyrics = track.get("lyrics") or ""
+        if lyrics == "Lyrics not found":
+            lyrics = ""
+        section = f"Song: {track['title']} by {track['artist']} (album: {track.get('album')})\nLyrics excerpt: {lyrics_excerpt(lyrics, question)}"
+        cost = estimate_tokens(section)
+        if used + cost > budget:
+            break
+        sections.append(section)
+        used += cost
+    return "\n\n".join(sections)
+
+
+def build_playlist_context(tracks_with_lyrics, question, budget=PLAYLIST_CONTEXT_TOKENS):
+    """
+    Compact playlist context for a chat turn: a digest of the whole playlist plus
+    the few tracks most relevant to the question, kept within `budget` tokens
+    instead of inlining every track and its full lyrics.
+    """
+    digest_budget = int(budget * DIGEST_SHARE)
+    digest = build_playlist_digest(tracks_with_lyrics, digest_budget)
+    relevant = build_relevant_tracks(tracks_with_lyrics, question, budget - estimate_tokens(digest))
+    context = f"Playlist overview:\n{digest}"
+    if relevant:
+        context += f"\n\nTracks relevant to the user's message:\n{relevant}"
+    return context
@@ -0,0 +1,31 @@
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_timings = defaultdict(lambda: deque(maxlen=200))
+
+
+@contextmanager
+def timed(component):
+    """Record server-side render time of a component (full run or fragment rerun)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _timings[component].append(time.perf_counter() - start)
+
+
+def render_timing_stats():
+    with _lock:
+        return {
+            component: {
+                "runs": len(samples),
+                "median_ms": round(1000 * statistics.median(samples), 1),
+                "max_ms": round(1000 * max(samples), 1),
+            }
+            for component, samples in _timings.items() if samples
+        }
@@ -1,49 +1,90 @@
-import requests
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from core import http_client
 import streamlit as st
 from core.oauth_flow import get_spotify_client, logout_spotify
 from ui.tabs import analyze_result
-from core.lyrics import process_tracks, get_lyrics_auto
+from core.lyrics import get_lyrics_auto, build_track_record
 from core.autogen import setup_autogen_agents
+from core.pagination import iter_pages, PLAYLIST_TRACK_FIELDS, PLAYLIST_DETAIL_FIELDS, PLAYLIST_PAGE_SIZE
+
+# Refresh this many seconds before Spotify says the token expires.
+TOKEN_REFRESH_MARGIN = 60
+
+_token_cache = {}
+_token_locks = defaultdict(threading.Lock)
+_token_locks_guard = threading.Lock()
+
+
+def _cached_token(key):
+    cached = _token_cache.get(key)
+    if cached and cached["expires_at"] - time.time() > TOKEN_REFRESH_MARGIN:
+        return cached["access_token"]
+    return None
+
 
 def get_spotify_token(client_id, client_secret):
-    auth_url = "https://accounts.spotify.com/api/token"
-    auth_response = requests.post(
-        auth_url,
-        data={"grant_type": "client_credentials"},
-        auth=(client_id, client_secret)
-    )
-    if auth_response.status_code != 200:
-        st.error(f"Failed to get Spotify token: {auth_response.text}")
-        return None
-    return auth_response.json().get("access_token")
+    """
+    Client-credentials token, cached process-wide per client id so Streamlit
+    reruns don't hit accounts.spotify.com. Concurrent sessions needing a refresh
+    wait on one request instead of each sending their own.
+    """
+    key = (client_id, hashlib.sha256(client_secret.encode()).hexdigest())
+    token = _cached_token(key)
+    if token:
+        return token
+
+    with _token_locks_guard:
+        lock = _token_locks[key]
+    with lock:
+        token = _cached_token(key)
+        if token:
+            return token
+
+        auth_url = "https://accounts.spotify.com/api/token"
+        auth_response = http_client.post(
+            auth_url,
+            data={"grant_type": "client_credentials"},
+            auth=(client_id, client_secret)
+        )
+        if auth_response.status_code != 200:
+            st.error(f"Failed to get Spotify token: {auth_response.text}")
+            return None
+        data = auth_response.json()
+        _token_cache[key] = {
+            "access_token": data.get("access_token"),
+            "expires_at": time.time() + data.get("expires_in", 3600)
+        }
+        return data.get("access_token")
 
 
 def extract_playlist_id(playlist_url):
     return playlist_url.split("/")[-1].split("?")[0]
 
 
-def get_playlist_tracks(access_token, playlist_id):
+def fetch_playlist_tracks_page(access_token, playlist_id, offset):
     headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-    tracks = []
-    try:
-        while url:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            tracks.extend(data["items"])
-            url = data.get("next")
-        return tracks
-    except Exception as e:
-        st.error(f"Error fetching playlist tracks: {e}")
-        return []
+    params = {"limit": PLAYLIST_PAGE_SIZE, "offset": offset, "fields": PLAYLIST_TRACK_FIELDS}
+    response = http_client.get(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", headers=headers, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_playlist_tracks(access_token, playlist_id):
+    """Yield playlist items as pages arrive; pages after the first are fetched concurrently."""
+    for page in iter_pages(lambda offset: fetch_playlist_tracks_page(access_token, playlist_id, offset), PLAYLIST_PAGE_SIZE):
+        yield from page["items"]
 
 
 def get_playlist_details(access_token, playlist_id):
     headers = {"Authorization": f"Bearer {access_token}"}
     url = f"https://api.spotify.com/v1/playlists/{playlist_id}"
+    # Skip the embedded first page of tracks; iter_playlist_tracks fetches those.
+    params = {"fields": PLAYLIST_DETAIL_FIELDS}
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers, params=params)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -90,15 +131,8 @@ def search_spotify_tracks():
             
                     if analyze_result_clicked:
                         # Prepare track dict to match analyzer expected keys
-                        lyrics = get_lyrics_auto(track["artists"][0]["name"], track["name"])
-                        selected_track = {
-                            "id": track["id"],
-                            "artist": track["artists"][0]["name"],
-                            "title": track["name"],
-                            "lyrics": lyrics or "Lyrics not found",
-                            "preview_url": track.get("preview_url"),
-                            "album": track.get("album", {}).get("name", "Unknown Album")
-                        }
+                        lyrics = get_lyrics_auto(track["artists"][0]["name"], track["name"], track["id"])
+                        selected_track = build_track_record(track, lyrics)
                         # Ensure playlist_data and agents exist in session_state or pass None if not available
                         playlist_data = st.session_state.get('playlist_data')
                         agents = setup_autogen_agents(st.session_state.get('gemini_api_key'))
@@ -0,0 +1,101 @@
+import math
+import re
+from collections import Counter, defaultdict
+import jieba
+import streamlit as st
+from core.lyrics import CJK_PATTERN
+
+CJK_RUN = re.compile(CJK_PATTERN.pattern + '+')
+LATIN_WORD = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    "a", "an", "and", "are", "by", "do", "for", "i", "in", "is", "it", "me", "my", "of",
+    "on", "or", "that", "the", "to", "was", "what", "which", "with", "you", "your",
+}
+HANGUL = re.compile(r'[\uac00-\ud7af]')
+KANA = re.compile(r'[\u3040-\u30ff]')
+# Title and artist matches count for more than a word somewhere in the lyrics.
+FIELD_WEIGHTS = {"title": 3, "artist": 3, "album": 1, "lyrics": 1}
+
+
+def tokenize(text):
+    text = (text or "").lower()
+    tokens = [w.strip("'") for w in LATIN_WORD.findall(text)]
+    for run in CJK_RUN.findall(text):
+        tokens.extend(w for w in jieba.lcut(run) if w.strip())
+    return [t for t in tokens if t and t not in STOPWORDS]
+
+
+def track_language(track):
+    """Best guess from the script of the lyrics (or the title when lyrics are missing)."""
+    lyrics = track.get("lyrics")
+    text = lyrics if lyrics and lyrics != "Lyrics not found" else f"{track.get('title', '')} {track.get('artist', '')}"
+    if HANGUL.search(text):
+        return "korean"
+    if KANA.search(text):
+        return "japanese"
+    if CJK_PATTERN.search(text):
+        return "chinese"
+    return "english"
+
+
+def track_fingerprint(tracks_with_lyrics):
+    return tuple(t.get("id") or f"{t['title']}|{t['artist']}" for t in tracks_with_lyrics)
+
+
+class TrackIndex:
+    """
+    BM25 index over track titles, artists, albums and lyrics, plus the lookups
+    the chatbot's local query path needs (tracks per artist, language per track,
+    lowercased lyrics).
+    """
+
+    def __init__(self, tracks_with_lyrics, k1=1.2, b=0.75):
+        self.tracks = tracks_with_lyrics
+        self.fingerprint = track_fingerprint(tracks_with_lyrics)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_lengths = []
+        self.by_artist = defaultdict(list)
+        self.languages = []
+        self.lyrics_lower = []
+        for doc_id, track in enumerate(tracks_with_lyrics):
+            self.by_artist[track["artist"].lower()].append(doc_id)
+            self.languages.append(track_language(track))
+            lyrics = track.get("lyrics") or ""
+            self.lyrics_lower.append("" if lyrics == "Lyrics not found" else lyrics.lower())
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = track.get(field)
+                if not value or value == "Lyrics not found":
+                    continue
+                for token in tokenize(value):
+                    counts[token] += weight
+            for token, tf in counts.items():
+                self.postings[token][doc_id] = tf
+            self.doc_lengths.append(sum(counts.values()))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def search(self, query, limit=5):
+        """Return up to `limit` (score, track) pairs, best match first."""
+        n_docs = len(self.tracks)
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(score, self.tracks[doc_id]) for doc_id, score in ranked]
+
+
+def get_track_index(tracks_with_lyrics):
+    """Index for the current playlist, rebuilt only when its track list changes."""
+    index = st.session_state.get("track_index")
+    if index is None or index.fingerprint != track_fingerprint(tracks_with_lyrics):
+        index = TrackIndex(tracks_with_lyrics)
+        st.session_state["track_index"] = index
+    return index
@@ -0,0 +1,150 @@
+import re
+from core.track_index import get_track_index
+
+MAX_LISTED = 20
+SONGS = r"(?:songs|tracks)"
+LANGUAGES = {
+    "chinese": "chinese", "mandarin": "chinese", "中文": "chinese", "華語": "chinese",
+    "english": "english", "英文": "english",
+    "japanese": "japanese", "日文": "japanese",
+    "korean": "korean", "韓文": "korean",
+}
+LANGUAGE = "(?P<lang>" + "|".join(LANGUAGES) + ")"
+
+# Every route must match the whole question (after normalize_question), so open-ended
+# questions that merely start like a lookup ("what songs from X would you recommend")
+# fall through to the LLM instead of getting a canned answer.
+LIST = r"(?:list|show(?: me)?|which|what)(?: are)?(?: all)?(?: the| my)?"
+HAVE = r"(?: (?:do i have|have i got|are there|are))?"
+WHERE = r"(?: (?:in|on) (?:my|this|the) playlist)?"
+ARTIST = r"(?P<artist>.{1,60}?)"
+
+COUNT_LANGUAGE = re.compile(rf"how many {LANGUAGE} {SONGS}{HAVE}{WHERE}", re.I)
+COUNT_ARTIST = re.compile(rf"how many {SONGS}{HAVE}{WHERE} (?:by|from) {ARTIST}{HAVE}{WHERE}", re.I)
+COUNT_ALL = re.compile(rf"how many {SONGS}{HAVE}{WHERE}", re.I)
+LIST_LANGUAGE = re.compile(rf"{LIST} {LANGUAGE} ?(?:{SONGS}|歌){HAVE}{WHERE}", re.I)
+LIST_ARTIST = re.compile(rf"{LIST} {SONGS}{HAVE}{WHERE} (?:by|from) {ARTIST}{HAVE}{WHERE}", re.I)
+MENTION = re.compile(
+    rf"(?:{LIST}|(?:do|does) any) {SONGS}{HAVE}{WHERE}(?: that| which)? "
+    rf"(?:mentions?|contains?|says?|talks? about|sings? about|with the word) (?P<phrase>.{{1,40}}?){WHERE}",
+    re.I
+)
+WHO_SINGS = re.compile(r"who (?:sings|sang|performs|performed) (?P<title>.{1,80}?)", re.I)
+WHICH_ALBUM = re.compile(r"(?:what|which) album is (?P<title>.{1,80}?) (?:on|from|in)", re.I)
+# Advice and recommendation questions always go to the LLM.
+OPEN_ENDED = re.compile(r"\b(?:recommend\w*|suggest\w*|should|similar)\b", re.I)
+
+
+def normalize_question(text):
+    return " ".join(text.split()).strip("?!.。？！ ")
+
+
+def clean_phrase(text):
+    return text.strip().strip("?!.。？！\"'“”‘’ ").strip()
+
+
+def format_tracks(index, doc_ids, heading):
+    if not doc_ids:
+        return None
+    lines = [f"{i + 1}. {index.tracks[d]['title']} - {index.tracks[d]['artist']}" for i, d in enumerate(doc_ids[:MAX_LISTED])]
+    if len(doc_ids) > MAX_LISTED:
+        lines.append(f"... and {len(doc_ids) - MAX_LISTED} more")
+    return heading + "<br>" + "<br>".join(lines)
+
+
+def match_artist(index, name):
+    name = clean_phrase(name).lower()
+    if not name:
+        return None, []
+    if name in index.by_artist:
+        return index.tracks[index.by_artist[name][0]]["artist"], index.by_artist[name]
+    for artist, doc_ids in index.by_artist.items():
+        if name in artist:
+            return index.tracks[doc_ids[0]]["artist"], doc_ids
+    return None, []
+
+
+def match_title(index, title):
+    title = clean_phrase(title).lower()
+    if not title:
+        return None
+    exact = [t for t in index.tracks if t["title"].lower() == title]
+    if exact:
+        return exact[0]
+    return next((t for t in index.tracks if title in t["title"].lower()), None)
+
+
+def tracks_mentioning(index, phrase):
+    phrase = clean_phrase(phrase).lower()
+    if not phrase:
+        return phrase, []
+    if phrase.isascii():
+        # Prefix match so "rain" also finds "raining" and "rainy".
+        pattern = re.compile(r"\b" + re.escape(phrase))
+        return phrase, [d for d, lyrics in enumerate(index.lyrics_lower) if pattern.search(lyrics)]
+    return phrase, [d for d, lyrics in enumerate(index.lyrics_lower) if phrase in lyrics]
+
+
+def answer_playlist_query(text, tracks_with_lyrics):
+    """
+    Answer count / filter / lookup questions about the loaded playlist straight
+    from the track index. Returns None when the question isn't one of those, so
+    the caller can fall through to the LLM.
+    """
+    if not tracks_with_lyrics:
+        return None
+    text = normalize_question(text)
+    if OPEN_ENDED.search(text):
+        return None
+    index = get_track_index(tracks_with_lyrics)
+
+    match = COUNT_LANGUAGE.fullmatch(text)
+    if match:
+        language = LANGUAGES[match.group("lang").lower()]
+        count = index.languages.count(language)
+        return f"Your playlist has {count} {language.capitalize()} song{'s' if count != 1 else ''}."
+
+    match = COUNT_ARTIST.fullmatch(text)
+    if match:
+        artist, doc_ids = match_artist(index, match.group("artist"))
+        if artist:
+            return f"Your playlist has {len(doc_ids)} song{'s' if len(doc_ids) != 1 else ''} by {artist}."
+        return None
+
+    match = MENTION.fullmatch(text)
+    if match:
+        phrase, doc_ids = tracks_mentioning(index, match.group("phrase"))
+        if phrase:
+            return format_tracks(index, doc_ids, f"{len(doc_ids)} track(s) mention \"{phrase}\":") \
+                or f"No tracks in your playlist mention \"{phrase}\"."
+
+    match = LIST_LANGUAGE.fullmatch(text)
+    if match:
+        language = LANGUAGES[match.group("lang").lower()]
+        doc_ids = [d for d, lang in enumerate(index.languages) if lang == language]
+        return format_tracks(index, doc_ids, f"{language.capitalize()} songs in your playlist ({len(doc_ids)}):") \
+            or f"There are no {language.capitalize()} songs in your playlist."
+
+    match = LIST_ARTIST.fullmatch(text)
+    if match:
+        artist, doc_ids = match_artist(index, match.group("artist"))
+        if artist:
+            return format_tracks(index, doc_ids, f"Songs by {artist} in your playlist ({len(doc_ids)}):")
+        return None
+
+    match = WHO_SINGS.fullmatch(text)
+    if match:
+        track = match_title(index, match.group("title"))
+        if track:
+            return f"\"{track['title']}\" is by {track['artist']}."
+
+    match = WHICH_ALBUM.fullmatch(text)
+    if match:
+        track = match_title(index, match.group("title"))
+        if track:
+            return f"\"{track['title']}\" is on the album \"{track.get('album', 'Unknown Album')}\"."
+
+    if COUNT_ALL.fullmatch(text):
+        return f"Your playlist has {len(tracks_with_lyrics)} songs."
+
+    return None
@@ -0,0 +1,67 @@
+import pytest
+import core.track_query as track_query
+from core.track_index import TrackIndex
+
+TRACKS = [
+    {"id": "1", "title": "Shake It Off", "artist": "Taylor Swift", "album": "1989", "lyrics": "players gonna play, shake it off"},
+    {"id": "2", "title": "Love Story", "artist": "Taylor Swift", "album": "Fearless", "lyrics": "romeo take me somewhere"},
+    {"id": "3", "title": "晴天", "artist": "周杰倫", "album": "葉惠美", "lyrics": "故事的小黃花 從出生那年就飄著"},
+]
+
+
+@pytest.fixture(autouse=True)
+def plain_index(monkeypatch):
+    # Skip the session-state cache; it needs a Streamlit runtime.
+    monkeypatch.setattr(track_query, "get_track_index", TrackIndex)
+
+
+@pytest.mark.parametrize("question", [
+    "What songs from Taylor Swift would you recommend?",
+    "Which songs from the 80s should I add to this playlist?",
+    "Recommend me songs that talk about heartbreak",
+    "What Chinese songs would you recommend for a rainy day?",
+    "How many songs should a good workout playlist have?",
+    "Which songs from the 80s are the best?",
+    "What songs are similar to Love Story?",
+    "How many songs by Adele are in my playlist?",
+    "Tell me about songs that mention rain in pop history",
+])
+def test_open_ended_questions_fall_through(question):
+    assert track_query.answer_playlist_query(question, TRACKS) is None
+
+
+def test_count_all():
+    assert track_query.answer_playlist_query("How many songs are in my playlist?", TRACKS) == "Your playlist has 3 songs."
+
+
+def test_count_language():
+    assert track_query.answer_playlist_query("how many chinese songs do I have", TRACKS) == "Your playlist has 1 Chinese song."
+
+
+def test_count_artist():
+    answer = track_query.answer_playlist_query("How many songs by Taylor Swift are in my playlist?", TRACKS)
+    assert answer == "Your playlist has 2 songs by Taylor Swift."
+
+
+def test_list_artist():
+    answer = track_query.answer_playlist_query("Which songs are by taylor swift?", TRACKS)
+    assert answer.startswith("Songs by Taylor Swift in your playlist (2):")
+
+
+def test_list_language():
+    answer = track_query.answer_playlist_query("Show me the Chinese songs in my playlist", TRACKS)
+    assert answer.startswith("Chinese songs in your playlist (1):")
+    assert "晴天" in answer
+
+
+def test_mention():
+    answer = track_query.answer_playlist_query("Which songs mention \"romeo\"?", TRACKS)
+    assert answer.startswith("1 track(s) mention \"romeo\":")
+    assert track_query.answer_playlist_query("Do any songs talk about rain?", TRACKS) == \
+        "No tracks in your playlist mention \"rain\"."
+
+
+def test_who_sings_and_album():
+    assert track_query.answer_playlist_query("Who sings Love Story?", TRACKS) == "\"Love Story\" is by Taylor Swift."
+    assert track_query.answer_playlist_query("What album is Shake It Off on?", TRACKS) == \
+        "\"Shake It Off\" is on the album \"1989\"."
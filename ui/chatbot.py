@@ -1,6 +1,9 @@
 import re
 import streamlit as st
-from core.autogen import setup_autogen_agents
+from core.autogen import setup_autogen_agents, stream_completion
+from core.prompt_builder import build_playlist_context
+from core.track_query import answer_playlist_query
+from core.chat_memory import update_chat_memory, build_conversation_prompt
 from core.playback import (
     search_tracks, add_track_to_queue, add_track_to_playlist,
     create_playlist, play_playlist, pause_playback, next_track, get_spotify_client, play_track 
@@ -18,6 +21,21 @@ def is_playback_control_request(text):
     ]
     return any(k in text.lower() for k in keywords)
 
+def show_more_song_results():
+    st.session_state["song_offset"] = st.session_state.get("song_offset", 0) + 10
+    access_token = st.session_state.get("access_token")
+    query = st.session_state.get("last_song_query")
+    if query and access_token:
+        st.session_state["pending_song_results"] = search_tracks(access_token, query, limit=10, offset=st.session_state["song_offset"])
+
+def dismiss_song_results():
+    st.session_state["pending_song_results"] = None
+    st.session_state["song_offset"] = 0
+    st.session_state.chat_history.append({
+        "role": "assistant",
+        "content": "Okay! You can enter a new song or artist to try again."
+    })
+
 def render_pending_song_results():
     if st.session_state.get("pending_song_results"):
         for track in st.session_state["pending_song_results"]:
@@ -33,24 +51,13 @@ def render_pending_song_results():
                 })
                 st.session_state["pending_song_results"] = None
                 st.session_state["song_offset"] = 0
-                st.experimental_rerun()
-
-        if st.button("▶️ Show more", key="song-more"):
-            st.session_state["song_offset"] = st.session_state.get("song_offset", 0) + 10
-            access_token = st.session_state.get("access_token")
-            query = st.session_state.get("last_song_query")
-            if query and access_token:
-                st.session_state["pending_song_results"] = search_tracks(access_token, query, limit=10, offset=st.session_state["song_offset"])
-            st.experimental_rerun()
-
-        if st.button("❌ None of these", key="song-none"):
-            st.session_state["pending_song_results"] = None
-            st.session_state["song_offset"] = 0
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": "Okay! You can enter a new song or artist to try again."
-            })
-            st.experimental_rerun()
+                # Full rerun so the jukebox fragment shows the new queue too.
+                st.rerun()
+
+        # Callbacks run before the rerun the click triggers, so that rerun already
+        # renders the new state without a scoped st.rerun().
+        st.button("▶️ Show more", key="song-more", on_click=show_more_song_results)
+        st.button("❌ None of these", key="song-none", on_click=dismiss_song_results)
         return True
     return False
 
@@ -65,7 +72,8 @@ def process_song_request(user_input):
     if results:
         st.session_state.pending_song_results = results
         st.session_state.chat_history.append({"role": "assistant", "content": "🎶 Select a song below to add to your playback queue:"})
-        st.experimental_rerun()
+        # Runs inside the chat input callback, which reruns the chat fragment on its own.
+        return None
     return "❌ No songs found for your request."
 
 def process_playback_control(user_input):
@@ -84,6 +92,32 @@ def process_playback_control(user_input):
     else:
         return "Playback command not recognized."
 
+def stream_pending_reply(agents):
+    """
+    Render the queued LLM reply token by token, then keep it in chat_history.
+    The request stays queued until the reply is stored, so a rerun mid-stream
+    starts it again instead of losing it.
+    """
+    messages = st.session_state["pending_llm_messages"]
+    placeholder = st.empty()
+    reply = ""
+    try:
+        for delta in stream_completion(agents["gemini_llm"], messages, "chat"):
+            reply += delta
+            placeholder.markdown(
+                f'<div class="assistant-message"><strong>Assistant:</strong> {reply}</div>',
+                unsafe_allow_html=True
+            )
+        reply = reply or "Sorry, I couldn't generate a response."
+    except Exception as e:
+        reply = f"Error in chatbot: {str(e)}"
+    placeholder.markdown(
+        f'<div class="assistant-message"><strong>Assistant:</strong> {reply}</div>',
+        unsafe_allow_html=True
+    )
+    st.session_state.chat_history.append({"role": "assistant", "content": reply})
+    st.session_state.pop("pending_llm_messages", None)
+
 def music_chatbot_ui(agents, tracks_with_lyrics):
     sp = get_spotify_client()
     access_token = sp.auth_manager.get_access_token(as_dict=False)
@@ -97,6 +131,12 @@ def music_chatbot_ui(agents, tracks_with_lyrics):
             st.session_state.chat_history = []
         if "chat_input_key" not in st.session_state:
             st.session_state.chat_input_key = 0
+        update_chat_memory(agents)
+
+        # A playback command only reran this fragment; rerun the app so the jukebox
+        # shows the current track.
+        if st.session_state.pop("playback_changed", False):
+            st.rerun()
 
         def send_message():
             user_input = st.session_state.get(f"chat_input_{st.session_state.chat_input_key}", "").strip()
@@ -105,12 +145,16 @@ def music_chatbot_ui(agents, tracks_with_lyrics):
 
                 if is_playback_control_request(user_input):
                     reply = process_playback_control(user_input)
+                    # st.rerun() is a no-op inside a callback; the chat fragment picks this up.
+                    st.session_state["playback_changed"] = True
                 elif is_song_request(user_input):
                     reply = process_song_request(user_input)
+                elif (local_reply := answer_playlist_query(user_input, tracks_with_lyrics)) is not None:
+                    # Count / filter / lookup questions are answered from the track index, no LLM call.
+                    reply = local_reply
                 else:
                     # Original chatbot conversation logic
-                    context_messages = st.session_state.chat_history[-6:]
-                    prompt = "\n".join(f"{msg['role']}: {msg['content']}" for msg in context_messages)
+                    prompt = build_conversation_prompt(st.session_state.chat_history)
 
                     if tracks_with_lyrics and agents:
                         system_message = (
@@ -118,8 +162,8 @@ def music_chatbot_ui(agents, tracks_with_lyrics):
                             "You can recommend music, generate lyrics based on user mood or ideas, "
                             "analyze user playlists, and chat casually about music. "
                             "Avoid repeating songs already in the playlist. "
-                            "IMPORTANT: Only respond with plain text, no HTML or special formatting. "
-                            f"Here is the current playlist: {tracks_with_lyrics}. "
+                            "IMPORTANT: Only respond with plain text, no HTML or special formatting.\n\n"
+                            + build_playlist_context(tracks_with_lyrics, user_input)
                         )
                     else:
                         system_message = (
@@ -131,29 +175,23 @@ def music_chatbot_ui(agents, tracks_with_lyrics):
                             "IMPORTANT: Only respond with plain text, no HTML or special formatting. "
                         )
 
-                    try:
-                        if agents and "gemini_llm" in agents:
-                            gemini_llm = agents["gemini_llm"]
-                            messages = [
-                                {"role": "system", "content": system_message},
-                                {"role": "user", "content": prompt}
-                            ]
-                            response_obj = gemini_llm.chat.completions.create(
-                                model="gemini-2.0-flash-lite",
-                                messages=messages
-                            )
-                            reply = response_obj.choices[0].message.content if response_obj and response_obj.choices else "Sorry, I couldn't generate a response."
-                        else:
-                            reply = (
-                                "Hi! I'm your music assistant. I can help you discover new music, "
-                                "discuss artists and genres, or chat about anything music-related. "
-                                "Load a playlist to unlock advanced features like playlist analysis! "
-                                "What would you like to talk about?"
-                            )
-                    except Exception as e:
-                        reply = f"Error in chatbot: {str(e)}"
+                    if agents and "gemini_llm" in agents:
+                        # Streamed into the chat panel while it renders; see stream_pending_reply.
+                        st.session_state.pending_llm_messages = [
+                            {"role": "system", "content": system_message},
+                            {"role": "user", "content": prompt}
+                        ]
+                        reply = None
+                    else:
+                        reply = (
+                            "Hi! I'm your music assistant. I can help you discover new music, "
+                            "discuss artists and genres, or chat about anything music-related. "
+                            "Load a playlist to unlock advanced features like playlist analysis! "
+                            "What would you like to talk about?"
+                        )
 
-                st.session_state.chat_history.append({"role": "assistant", "content": reply})
+                if reply is not None:
+                    st.session_state.chat_history.append({"role": "assistant", "content": reply})
                 st.session_state.chat_input_key += 1
 
         # Render pending song selection buttons first if exist
@@ -180,6 +218,8 @@ def music_chatbot_ui(agents, tracks_with_lyrics):
                         '<div style="text-align: center; color: #888; padding: 20px;">Start a conversation!</div>',
                         unsafe_allow_html=True
                     )
+                if st.session_state.get("pending_llm_messages"):
+                    stream_pending_reply(agents)
 
             # Chat input box container
             with st.container(key="chat_input_container"):
@@ -1,15 +1,21 @@
 import streamlit as st
 import json
-from core.oauth_flow import get_spotify_client, logout_spotify
-from core.lyrics import process_tracks
-from core.autogen import setup_autogen_agents
+from core.oauth_flow import get_spotify_client, get_current_user, logout_spotify, get_user_playlists, iter_playlist_items
+from core.pagination import PLAYLIST_DETAIL_FIELDS
+from core.ingest import ingest_playlist
 from core.client_flow import playlist_client_flow
+from core.http_client import http_stats
+from core.lyrics import provider_stats
+from core.lyrics_cache import cache_stats
+from core.llm_cache import llm_cache_stats
+from core.autogen import llm_timing_stats
+from core.render_timing import render_timing_stats
 
 def account_info():
     sp = get_spotify_client()
     if sp:
         st.session_state['sp_info'] = False
-        user = sp.current_user()
+        user = get_current_user()
         
         with st.container(key="sidebar_user_info"):
             profile_col, user_col, button_col = st.columns([1, 3, 2])
@@ -43,8 +49,14 @@ def account_info():
         return None
 
 def playlist_list(sp):
-    playlists = sp.current_user_playlists()
-    playlist_items = playlists['items']
+    progress = st.empty()
+    playlist_items = get_user_playlists(
+        sp,
+        on_progress=lambda fetched, total: progress.progress(
+            fetched / total if total else 1.0, text=f"Loading playlists {fetched} / {total}"
+        )
+    )
+    progress.empty()
 
     with st.container(key="playlist_container", height=350):
         for i, album in enumerate(playlist_items):
@@ -59,24 +71,13 @@ def playlist_list(sp):
                     st.session_state['active_tab'] = 0
                     with st.spinner("Fetching playlist data..."):
                         try:
-                            playlist_data = sp.playlist(album['id'])
-                            tracks = sp.playlist_tracks(album['id'])
+                            playlist_data = sp.playlist(album['id'], fields=PLAYLIST_DETAIL_FIELDS)
                         except Exception:
                             st.error("Failed to connect to Spotify. Please check your authentication.")
                             st.stop()
 
-                        with st.spinner(f"Processing {playlist_data.get('tracks', {}).get('total', 0)} tracks..."):
-                            progress_bar = st.progress(0)
-                            tracks_with_lyrics = process_tracks(tracks['items'], progress_bar)
-
-                        with st.spinner("Setting up AutoGen agents..."):
-                            agents = setup_autogen_agents(st.session_state.get('gemini_api_key'))
-
-                        st.session_state['playlist_data'] = playlist_data
-                        st.session_state['tracks_with_lyrics'] = tracks_with_lyrics
-                        st.session_state['agents'] = agents
-                        st.session_state['analysis_ready'] = True
-                        st.rerun()
+                    ingest_playlist(playlist_data, iter_playlist_items(sp, album['id']))
+                    st.rerun()
             
             # Custom CSS for playlist list buttons
             st.markdown(f"""
@@ -137,6 +138,22 @@ def settings_popup():
         st.session_state['gemini_api_key'] = gemini_api_key
         st.rerun()
     
+def performance_stats():
+    """Collapsed panel with the counters the caches, HTTP pool and render timers keep."""
+    with st.expander("Performance stats"):
+        st.caption("HTTP connections per host")
+        st.json(http_stats(), expanded=False)
+        st.caption("Lyrics providers")
+        st.json(provider_stats(), expanded=False)
+        st.caption("Lyrics cache")
+        st.json(cache_stats(), expanded=False)
+        st.caption("LLM response cache")
+        st.json(llm_cache_stats(), expanded=False)
+        st.caption("LLM latency (seconds)")
+        st.json(llm_timing_stats(), expanded=False)
+        st.caption("Render time per component (full runs and fragment reruns)")
+        st.json(render_timing_stats(), expanded=False)
+
 def render_sidebar():
     with st.sidebar:
         sp = account_info()
@@ -150,12 +167,14 @@ def render_sidebar():
         
         if sp:
             with st.container(key="playlist_info"):
-                st.header(f"{sp.current_user()['display_name']}'s Playlist")
+                st.header(f"{get_current_user()['display_name']}'s Playlist")
                 playlist_list(sp)    
             playlist_client_flow()
         
         if st.button("Settings", icon="⚙️", key="settings_button"):
             settings_popup()
+
+        performance_stats()
         
         st.markdown(f"""
             <style>
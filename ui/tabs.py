@@ -1,14 +1,15 @@
 ### File: ui/tabs.py
 import streamlit as st
 import matplotlib.pyplot as plt
-from core.autogen import analyze_playlist_with_agents
-from core.lyrics import generate_wordcloud, generate_wordcloud_for_song, compute_sentiment_scores, plot_mood_radar
+from core.autogen import stream_playlist_analysis, song_analysis_status
+from core.lyrics import generate_wordcloud, generate_wordcloud_for_song, compute_sentiment_scores, compute_playlist_mood, plot_mood_radar
 
 def analyze_result(selected_track, playlist_data, agents):
     st.markdown(f"### ✨ {selected_track['title']} - {selected_track['artist']}")
-    with st.spinner("Analyzing lyrics..."):
-        result = analyze_playlist_with_agents(agents, playlist_data, [selected_track], "lyrics")
-        st.write(result)
+    if selected_track.get("analysis"):
+        st.write(selected_track["analysis"])
+    else:
+        st.write_stream(stream_playlist_analysis(agents, playlist_data, [selected_track], "lyrics"))
         
     col1, col2 = st.columns(2)
     with col1:
@@ -43,10 +44,8 @@ def display_playlist_info(playlist_data, tracks_with_lyrics, agents):
             if playlist_data.get("description"):
                 st.write(f"Description: {playlist_data['description']}")
 
-    with st.spinner("Analyzing playlist with Autogen..."):
-        analysis = analyze_playlist_with_agents(agents, playlist_data, tracks_with_lyrics, "general")
-        st.subheader("Playlist Analysis (via AutoGen)")
-        st.write(analysis)
+    st.subheader("Playlist Analysis (via AutoGen)")
+    st.write_stream(stream_playlist_analysis(agents, playlist_data, tracks_with_lyrics, "general"))
 
     all_lyrics = " ".join([
         track['lyrics'] for track in tracks_with_lyrics 
@@ -66,6 +65,13 @@ def display_playlist_info(playlist_data, tracks_with_lyrics, agents):
     else:
         st.warning("No lyrics available to generate a word cloud.")
 
+    st.subheader("Playlist Mood")
+    try:
+        fig = plot_mood_radar(compute_playlist_mood(tracks_with_lyrics))
+        st.pyplot(fig)
+    except Exception as e:
+        st.error(f"Error generating playlist mood: {e}")
+
 
 def display_tracks_list(tracks_with_lyrics):
     st.subheader("Tracks in Playlist")
@@ -96,6 +102,17 @@ def display_track_analyzer(playlist_data, tracks_with_lyrics, agents):
         st.warning("No tracks with lyrics available for analysis.")
         return
 
+    jobs = st.session_state.get('song_analysis_jobs') or []
+    running, errors = song_analysis_status(jobs)
+    if running:
+        analysed = sum(1 for t in tracks_with_lyrics if t.get("analysis"))
+        st.caption(f"Precomputing song analyses in the background: {analysed} / {len(available_tracks)} ready")
+    if errors:
+        st.warning(
+            f"{len(errors)} of {len(jobs)} background analysis batches failed ({errors[0]}). "
+            "Those songs are analysed when you select them."
+        )
+
     selected_song = st.selectbox("Select a track with lyrics", available_tracks)
     if st.button("Analyze Song", key="analyze_song_button"):
         selected_track = next(